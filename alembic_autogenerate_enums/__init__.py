@@ -4,8 +4,18 @@ SQLAlchemy enums.
 
 """
 
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from typing import Dict, FrozenSet, List, Optional, Tuple
 
 import alembic
@@ -14,6 +24,20 @@ import alembic.autogenerate.render
 import alembic.operations.base
 import alembic.operations.ops
 import sqlalchemy
+import sqlalchemy.exc
+import sqlalchemy.util
+
+try:
+    from sqlalchemy.ext.asyncio import (AsyncConnection, AsyncEngine,
+                                        create_async_engine)
+except ImportError:  # SQLAlchemy < 1.4
+    AsyncConnection = AsyncEngine = create_async_engine = None
+
+logger = logging.getLogger(__name__)
+
+# Per-thread state: the active managed_connections() manager and the enum
+# operation currently running.
+_active = threading.local()
 
 
 @dataclass
@@ -28,6 +52,109 @@ class DeclaredEnumValues:
     # enum name -> frozenset of values
     enum_definitions: Dict[str, FrozenSet[str]]
     table_definitions: Optional[List[EnumToTable]] = None
+    # enum name -> [(table name, column name)], built alongside table_definitions
+    columns_by_enum: Optional[Dict[str, List[Tuple[str, str]]]] = None
+    # enum name -> {old value: new value}, from "enum_value_renames" in the
+    # info of columns using the enum
+    renames_by_enum: Optional[Dict[str, Dict[str, str]]] = None
+
+
+class SyncEnumValuesError(Exception):
+    """
+    Raised when an enum sync cannot be applied safely.
+    """
+
+
+class EnumValueInUseError(SyncEnumValuesError):
+    """
+    Raised when a value that is being removed is still stored in a column.
+    """
+    def __init__(self, table_name, column_name, value):
+        super().__init__(
+            f"{table_name}.{column_name} still contains the value {value!r}, "
+            f"which is being removed from its enum"
+        )
+        self.table_name = table_name
+        self.column_name = column_name
+        self.value = value
+
+
+class EnumLockTimeoutError(SyncEnumValuesError):
+    """
+    Raised when an enum operation could not acquire its locks within its
+    retries or deadline. The attempt in progress has been rolled back.
+    """
+
+
+class EnumRewriteTooLargeError(SyncEnumValuesError):
+    """
+    Raised before anything is changed when a table that would have to be
+    converted is larger than the operation allows.
+    """
+    def __init__(self, plan):
+        super().__init__(f"refusing to convert tables over the size limit:\n{plan.format()}")
+        self.plan = plan
+
+
+class EnumValuesMismatchError(SyncEnumValuesError):
+    """
+    Raised by op.sync_enum_values_delta() when the values of an enum aren't
+    those the migration was generated against.
+    """
+    def __init__(self, schema, name, expected_hash, values):
+        super().__init__(
+            f"enum {schema}.{name} has {len(values)} value(s) hashing to {enum_values_hash(values)}, "
+            f"not the expected {expected_hash}"
+        )
+        self.schema = schema
+        self.name = name
+        self.expected_hash = expected_hash
+        self.values = values
+
+
+# Strategies for removing values from an enum that is in use. AUTO picks
+# REWRITE or ONLINE for each table from its size.
+REWRITE = "rewrite"
+ONLINE = "online"
+AUTO = "auto"
+STRATEGIES = (REWRITE, ONLINE, AUTO)
+
+DEFAULT_BATCH_SIZE = 10000
+
+# Tables bigger than this, counting indexes and TOAST, are converted with the
+# online strategy under AUTO.
+DEFAULT_ONLINE_ABOVE_BYTES = 256 * 1024 * 1024
+
+# Backoff between lock attempts: the delay doubles from the base up to the
+# cap, and is jittered down by up to half.
+LOCK_RETRY_BASE_DELAY = 0.5
+LOCK_RETRY_MAX_DELAY = 30.0
+
+# First PostgreSQL version accepting ALTER TYPE .. ADD VALUE in a transaction
+# block.
+TRANSACTIONAL_ADD_VALUE_VERSION = (12,)
+
+# First PostgreSQL version with ALTER TYPE .. RENAME VALUE.
+RENAME_VALUE_VERSION = (10,)
+
+# Most enum values listed by a single CREATE TYPE statement.
+ENUM_VALUES_PER_STATEMENT = 1000
+
+# Drivers sending statements without parameters as they are, so that one
+# string can hold several of them. Others, like asyncpg, prepare every
+# statement and reject that.
+MULTI_STATEMENT_DRIVERS = frozenset(["psycopg2", "psycopg2cffi"])
+
+# Table recording the progress of conversions that commit as they go, and
+# the work they have left, in the schema of the enum being converted. It
+# only exists while a conversion is unfinished.
+JOURNAL_TABLE = "alembic_enum_sync_journal"
+
+# execute_statement() kinds that change the schema.
+DDL_KINDS = frozenset([
+    "rename_type", "create_type", "drop_type", "add_value", "alter_table", "trigger", "create_index",
+    "drop_index", "rename_value", "journal_table",
+])
 
 
 def get_defined_enums(conn, schema):
@@ -43,68 +170,1930 @@ def get_defined_enums(conn, schema):
             "my_enum": frozenset(["a", "b", "c"]),
         }
     """
-    sql = """
-        SELECT
-            pg_catalog.format_type(t.oid, NULL),
-            ARRAY(SELECT enumlabel
-                  FROM pg_catalog.pg_enum
-                  WHERE enumtypid = t.oid)
-        FROM pg_catalog.pg_type t
-        LEFT JOIN pg_catalog.pg_namespace n ON n.oid = t.typnamespace
-        WHERE
-            t.typtype = 'e'
-            AND n.nspname = :schema
+    return get_defined_enums_by_schema(conn, [schema])[schema]
+
+
+def get_defined_enums_by_schema(conn, schemas):
+    """
+    Batched version of `get_defined_enums`: fetch the enumeration types of
+    every schema in `schemas` with a single catalog query.
+    :param conn:
+        SQLAlchemy connection instance.
+    :param list schemas:
+        Schema names (e.g. ["public", "tenant_1"]).
+    :returns dict:
+        Mapping of schema name to DeclaredEnumValues. Every requested schema
+        is present, schemas without enums map to an empty DeclaredEnumValues.
+    """
+    sql = """
+        SELECT
+            n.nspname,
+            t.typname,
+            ARRAY(SELECT enumlabel
+                  FROM pg_catalog.pg_enum
+                  WHERE enumtypid = t.oid
+                  ORDER BY enumsortorder)
+        FROM pg_catalog.pg_type t
+        JOIN pg_catalog.pg_namespace n ON n.oid = t.typnamespace
+        WHERE
+            t.typtype = 'e'
+            AND n.nspname = ANY(CAST(:schemas AS text[]))
+    """
+    schemas = sorted(set(schemas))
+    by_schema = {schema: DeclaredEnumValues({}) for schema in schemas}
+    for schema, name, values in conn.execute(sqlalchemy.text(sql), dict(schemas=schemas)):
+        by_schema[schema].enum_definitions[name] = frozenset(values)
+    return by_schema
+
+
+def is_enum_column_type(column_type):
+    """
+    Determines whether an column is a valid Enum type
+    """
+    if isinstance(column_type, sqlalchemy.TypeDecorator):
+        column_type = column_type.impl
+
+    if isinstance(column_type, sqlalchemy.Enum):
+        return True
+    return False
+
+
+def get_declared_enums(metadata, schema, default):
+    """
+    Return a dict mapping SQLAlchemy enumeration types to the set of their
+    declared values.
+    :param metadata:
+        ...
+    :param str schema:
+        Schema name (e.g. "public").
+    :returns DeclaredEnumValues:
+        enum_definitions: {
+            "my_enum": frozenset(["a", "b", "c"]),
+        },
+        table_definitions: [
+            EnumToTable(table_name="my_table", column_name="my_column", enum_name="my_enum"),
+        ]
+    """
+    by_schema = get_declared_enums_by_schema(metadata, default)
+    return by_schema.get(schema) or DeclaredEnumValues({}, [], {})
+
+
+def get_declared_enums_by_schema(metadata, default):
+    """
+    Walk `metadata` once and index every declared enumeration type by schema.
+    :param metadata:
+        SQLAlchemy MetaData instance.
+    :param str default:
+        Schema name used for enums that don't declare one.
+    :returns dict:
+        Mapping of schema name to DeclaredEnumValues, with `columns_by_enum`
+        listing the (table name, column name) pairs using each enum, and
+        `renames_by_enum` the value renames hinted by those columns as
+        Column(..., info={"enum_value_renames": {"old": "new"}}).
+    """
+    by_schema = {}
+    # is_enum_column_type() results keyed by id() of the type object; columns
+    # frequently share one Enum instance.
+    is_enum = {}
+
+    for table in metadata.tables.values():
+        for column in table.columns:
+            column_type = column.type
+            type_id = id(column_type)
+            if type_id not in is_enum:
+                is_enum[type_id] = is_enum_column_type(column_type)
+            if not is_enum[type_id]:
+                continue
+
+            schema = column_type.schema or default
+            declared = by_schema.get(schema)
+            if declared is None:
+                declared = by_schema[schema] = DeclaredEnumValues({}, [], {}, {})
+
+            name = column_type.name
+            declared.enum_definitions[name] = frozenset(column_type.enums)
+            declared.table_definitions.append(EnumToTable(table.name, column.name, name))
+            declared.columns_by_enum.setdefault(name, []).append((table.name, column.name))
+            renames = column.info.get("enum_value_renames")
+            if renames:
+                declared.renames_by_enum.setdefault(name, {}).update(renames)
+
+    return by_schema
+
+
+def enum_literal(value):
+    """
+    Quote an enum value as a SQL string literal for use in sqlalchemy.text().
+    """
+    return "'%s'" % value.replace("'", "''").replace(":", "\\:")
+
+
+def add_enum_values(conn, schema, name, values):
+    """
+    Add the values of `values` missing from enum `{schema}.{name}` inside the
+    current transaction, in a single round trip on MULTI_STATEMENT_DRIVERS
+    and one statement per value on the others.
+    """
+    statements = [f"ALTER TYPE {schema}.{name} ADD VALUE IF NOT EXISTS {enum_literal(value)}" for value in values]
+    if conn.dialect.driver in MULTI_STATEMENT_DRIVERS:
+        statements = ["; ".join(statements)] if statements else []
+    for statement in statements:
+        execute_statement(conn, "add_value", statement)
+
+
+def enum_values_hash(values):
+    """
+    Return a SHA-256 hex digest of the set of `values`, independent of their
+    order.
+    """
+    return hashlib.sha256(json.dumps(sorted(set(values))).encode("utf-8")).hexdigest()
+
+
+def get_enum_values(conn, schema, name):
+    """
+    Read the values of enum `{schema}.{name}`.
+    :returns frozenset:
+        The values, or None if the type doesn't exist.
+    """
+    sql = """
+        SELECT t.oid, e.enumlabel
+        FROM pg_catalog.pg_type t
+        JOIN pg_catalog.pg_namespace n ON n.oid = t.typnamespace
+        LEFT JOIN pg_catalog.pg_enum e ON e.enumtypid = t.oid
+        WHERE n.nspname = :schema AND t.typname = :name AND t.typtype = 'e'
+    """
+    rows = execute_statement(conn, "catalog", sql, dict(schema=schema, name=name)).fetchall()
+    if not rows:
+        return None
+    return frozenset(label for _, label in rows if label is not None)
+
+
+def create_enum_type(conn, schema, name, values, policy=None, replace=False):
+    """
+    Create enum `{schema}.{name}` with `values`, in their order, and commit
+    it: CREATE TYPE takes the first ENUM_VALUES_PER_STATEMENT values, and the
+    others are added by an ADD VALUE statement each. Values added this way
+    can't be used before they are committed, even in the transaction creating
+    the type, hence the commit. With `replace`, for a temporary type no column
+    can use yet, a type of that name left by an earlier failure is dropped
+    first.
+    """
+    values = list(values)
+
+    def create():
+        if replace:
+            execute_statement(conn, "drop_type", f"DROP TYPE IF EXISTS {schema}.{name}")
+        first = ", ".join(enum_literal(value) for value in values[:ENUM_VALUES_PER_STATEMENT])
+        execute_statement(conn, "create_type", f"CREATE TYPE {schema}.{name} AS ENUM({first})")
+        add_enum_values(conn, schema, name, values[ENUM_VALUES_PER_STATEMENT:])
+
+    execute_statement(conn, "transaction", "COMMIT")
+    run_with_lock_retries(conn, policy, create, transaction="block")
+
+
+def discard_enum_type(conn, schema, name):
+    """
+    Drop enum `{schema}.{name}`, made by create_enum_type() for a step that
+    then failed, after rolling back the failed transaction block. Errors are
+    logged rather than raised, so they don't hide the original failure.
+    """
+    try:
+        execute_statement(conn, "transaction", "ROLLBACK")
+        execute_statement(conn, "drop_type", f"DROP TYPE IF EXISTS {schema}.{name}")
+    except sqlalchemy.exc.DBAPIError:
+        logger.warning("could not drop %s.%s", schema, name, exc_info=True)
+
+
+def group_columns_by_table(affected_columns):
+    """
+    Group (table name, column name) pairs by table, keeping the order in which
+    tables and columns first appear.
+    :returns dict:
+        Mapping of table name to the list of its column names.
+    """
+    by_table = {}
+    for table_name, column_name in affected_columns:
+        column_names = by_table.setdefault(table_name, [])
+        if column_name not in column_names:
+            column_names.append(column_name)
+    return by_table
+
+
+@dataclass
+class StatementEvent:
+    """
+    One statement run on behalf of an enum operation.
+    """
+    # e.g. "rename_type", "alter_table", "backfill"; see execute_statement()
+    kind: str
+    schema: Optional[str]
+    type_name: Optional[str]
+    table_name: Optional[str]
+    statement: str
+    # seconds
+    wall_time: float
+    # seconds spent waiting on locks, when sampled; see instrument()
+    lock_wait_time: Optional[float]
+    rows_affected: Optional[int]
+    # the error raised by the statement, if it failed
+    error: Optional[str] = None
+
+
+_statement_listeners = []
+
+
+def add_statement_listener(listener):
+    """
+    Call `listener(event)` with a StatementEvent for every statement run by
+    an enum operation.
+    """
+    _statement_listeners.append(listener)
+
+
+def remove_statement_listener(listener):
+    _statement_listeners.remove(listener)
+
+
+class LockWaitSampler(threading.Thread):
+    """
+    Poll pg_stat_activity from a separate connection and accumulate the time
+    a backend spends waiting on locks.
+    """
+    def __init__(self, engine, pid, interval):
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.pid = pid
+        self.interval = interval
+        self.waited = 0.0
+        self.stopped = threading.Event()
+
+    sql = sqlalchemy.text(
+        "SELECT wait_event_type = 'Lock' FROM pg_catalog.pg_stat_activity WHERE pid = :pid"
+    )
+
+    def run(self):
+        if is_async_dialect(self.engine):
+            asyncio.run(self.run_async())
+            return
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            while not self.stopped.wait(self.interval):
+                if conn.execute(self.sql, dict(pid=self.pid)).scalar():
+                    self.waited += self.interval
+
+    async def run_async(self):
+        # asyncio driver connections belong to the event loop that opened
+        # them, so this thread's loop gets an engine of its own.
+        engine = create_async_engine(self.engine.url, poolclass=sqlalchemy.pool.NullPool)
+        try:
+            async with engine.connect() as conn:
+                await conn.execution_options(isolation_level="AUTOCOMMIT")
+                while not self.stopped.is_set():
+                    await asyncio.sleep(self.interval)
+                    if (await conn.execute(self.sql, dict(pid=self.pid))).scalar():
+                        self.waited += self.interval
+        finally:
+            await engine.dispose()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class StatementLog:
+    """
+    Events collected by instrument(), with a summary suitable for a metrics
+    pipeline.
+    """
+    def __init__(self, sample_lock_waits=False, interval=0.05):
+        self.events = []
+        self.sample_lock_waits = sample_lock_waits
+        self.interval = interval
+        self.samplers = {}
+
+    def __call__(self, event):
+        self.events.append(event)
+
+    def get_sampler(self, conn):
+        pid = conn.info.get("backend_pid")
+        if pid is None:
+            pid = conn.info["backend_pid"] = conn.execute(sqlalchemy.text("SELECT pg_backend_pid()")).scalar()
+        sampler = self.samplers.get(pid)
+        if sampler is None:
+            sampler = self.samplers[pid] = LockWaitSampler(conn.engine, pid, self.interval)
+            sampler.start()
+        return sampler
+
+    def close(self):
+        for sampler in self.samplers.values():
+            sampler.stop()
+        self.samplers.clear()
+
+    def summary(self):
+        """
+        Return totals over every collected event, overall and by kind.
+        """
+        def totals(events):
+            return {
+                "statements": len(events),
+                "wall_time": sum(event.wall_time for event in events),
+                "lock_wait_time": sum(event.lock_wait_time or 0.0 for event in events),
+                "rows_affected": sum(event.rows_affected or 0 for event in events),
+            }
+
+        by_kind = {}
+        for event in self.events:
+            by_kind.setdefault(event.kind, []).append(event)
+        summary = totals(self.events)
+        summary["by_kind"] = {kind: totals(events) for kind, events in sorted(by_kind.items())}
+        return summary
+
+
+@contextmanager
+def instrument(listener=None, sample_lock_waits=False, interval=0.05):
+    """
+    Collect a StatementEvent for every statement run by enum operations within
+    the block, e.g. around context.run_migrations() in env.py:
+
+        with alembic_autogenerate_enums.instrument() as log:
+            context.run_migrations()
+        metrics.send(log.summary())
+
+    :param listener:
+        Optional callable also receiving every event as it happens.
+    :param bool sample_lock_waits:
+        Measure each statement's lock wait time by polling pg_stat_activity
+        every `interval` seconds from a separate connection.
+    """
+    log = StatementLog(sample_lock_waits, interval)
+    add_statement_listener(log)
+    if listener is not None:
+        add_statement_listener(listener)
+    try:
+        yield log
+    finally:
+        remove_statement_listener(log)
+        if listener is not None:
+            remove_statement_listener(listener)
+        log.close()
+
+
+@contextmanager
+def operation_context(schema, name):
+    """
+    Attribute statements run within the block to enum `{schema}.{name}`.
+    """
+    previous = getattr(_active, "operation", None)
+    _active.operation = (schema, name)
+    try:
+        yield
+    finally:
+        _active.operation = previous
+
+
+def execute_statement(conn, kind, sql, params=None, table_name=None):
+    """
+    Run `sql` for an enum operation, reporting a StatementEvent to listeners
+    and to the debug log.
+    :param str kind:
+        Statement category: "catalog", "preflight", "rename_type",
+        "create_type", "drop_type", "add_value", "alter_table", "lock",
+        "transaction", "trigger", "backfill", "create_index", "drop_index",
+        "analyze", "rename_value", "journal" (reads and writes of the
+        resumable conversion journal) or "journal_table" (creating and
+        dropping it).
+    """
+    if kind in DDL_KINDS:
+        # asyncpg caches type OIDs and prepared statements, which SQLAlchemy
+        # only invalidates by itself for DDL constructs, not text().
+        invalidate = getattr(conn.dialect, "_invalidate_schema_cache", None)
+        if invalidate is not None:
+            invalidate()
+
+    if not _statement_listeners and not logger.isEnabledFor(logging.DEBUG):
+        return conn.execute(sqlalchemy.text(sql), params or {})
+
+    samplers = [
+        listener.get_sampler(conn)
+        for listener in _statement_listeners
+        if isinstance(listener, StatementLog) and listener.sample_lock_waits
+    ]
+    waited = [sampler.waited for sampler in samplers]
+    started = time.perf_counter()
+    result = error = None
+    try:
+        result = conn.execute(sqlalchemy.text(sql), params or {})
+    except sqlalchemy.exc.DBAPIError as e:
+        error = e
+    wall_time = time.perf_counter() - started
+
+    schema, type_name = getattr(_active, "operation", None) or (None, None)
+    event = StatementEvent(
+        kind=kind,
+        schema=schema,
+        type_name=type_name,
+        table_name=table_name,
+        statement=sql,
+        wall_time=wall_time,
+        lock_wait_time=(
+            max(sampler.waited - before for sampler, before in zip(samplers, waited))
+            if samplers else None
+        ),
+        rows_affected=result.rowcount if result is not None and result.rowcount >= 0 else None,
+        error=None if error is None else str(error.orig),
+    )
+    logger.debug("%s", event)
+    for listener in list(_statement_listeners):
+        listener(event)
+    if error is not None:
+        raise error
+    return result
+
+
+@dataclass
+class LockPolicy:
+    """
+    How an enum operation waits for locks; see SyncEnumValuesOp.sync_enum_values().
+    """
+    # lock_timeout setting applied to every statement, e.g. "2s"; None keeps
+    # the server's
+    lock_timeout: Optional[str] = None
+    # further attempts after the first one fails to get its locks
+    retries: int = 0
+    # time.monotonic() after which no further attempt is started
+    deadline: Optional[float] = None
+
+    @classmethod
+    def create(cls, lock_timeout=None, retries=0, deadline=None):
+        """
+        Build a policy from sync_enum_values() arguments, or return None when
+        they leave lock handling as it is.
+        :param lock_timeout:
+            Milliseconds as an int, or a PostgreSQL interval string.
+        :param float deadline:
+            Seconds from now.
+        """
+        if lock_timeout is None and not retries and deadline is None:
+            return None
+        if isinstance(lock_timeout, int):
+            lock_timeout = f"{lock_timeout}ms"
+        return cls(
+            lock_timeout=lock_timeout,
+            retries=retries,
+            deadline=None if deadline is None else time.monotonic() + deadline,
+        )
+
+
+def is_lock_not_available(error):
+    """
+    Whether a DBAPI error is PostgreSQL's lock_not_available (55P03), raised
+    both by lock_timeout and by NOWAIT.
+    """
+    orig = getattr(error, "orig", None)
+    return "55P03" in (getattr(orig, "pgcode", None), getattr(orig, "sqlstate", None))
+
+
+def set_lock_timeout(conn, lock_timeout, local=True):
+    """
+    Set lock_timeout for the current transaction (or session, when `local` is
+    false) and return the previous value.
+    """
+    previous = execute_statement(conn, "catalog", "SELECT current_setting('lock_timeout')").scalar()
+    scope = "LOCAL " if local else ""
+    execute_statement(conn, "transaction", f"SET {scope}lock_timeout = {enum_literal(lock_timeout)}")
+    return previous
+
+
+def is_committed_out_of_band(conn):
+    """
+    Return True if the transaction SQLAlchemy believes `conn` is in was
+    ended on the server by a raw COMMIT, as committing enum operations send.
+    The driver then won't begin a new one by itself, so savepoints fail.
+    Only psycopg2 and asyncpg are told apart; other drivers return False.
+    """
+    dbapi_connection = conn.connection.dbapi_connection
+    # psycopg2: STATUS_BEGIN, yet libpq reports TRANSACTION_STATUS_IDLE
+    if hasattr(dbapi_connection, "get_transaction_status"):
+        return dbapi_connection.status == 2 and dbapi_connection.get_transaction_status() == 0
+    # SQLAlchemy's asyncpg adapter, which begins a transaction only once
+    driver_connection = getattr(dbapi_connection, "_connection", None)
+    if getattr(dbapi_connection, "_started", False) and hasattr(driver_connection, "is_in_transaction"):
+        return not driver_connection.is_in_transaction()
+    return False
+
+
+def run_with_lock_retries(conn, policy, attempt, transaction="savepoint"):
+    """
+    Call `attempt()` under `policy`, retrying with jittered exponential
+    backoff whenever it fails to get a lock.
+    :param str transaction:
+        How each attempt is isolated so that it can be rolled back:
+        "savepoint" runs it in a savepoint of the current transaction;
+        "block" wraps it in its own BEGIN/COMMIT, for connections that were
+        committed out of SQLAlchemy's transaction; "none" runs it as is, for
+        single statements outside any transaction block. "savepoint" falls
+        back to "block" if an earlier operation committed the connection;
+        see is_committed_out_of_band().
+    :raises EnumLockTimeoutError:
+        When the retries or the deadline are exhausted.
+    """
+    if transaction == "savepoint" and policy is not None and is_committed_out_of_band(conn):
+        transaction = "block"
+    if policy is None:
+        if transaction == "block":
+            execute_statement(conn, "transaction", "BEGIN")
+            attempt()
+            execute_statement(conn, "transaction", "COMMIT")
+        else:
+            attempt()
+        return
+
+    attempt_number = 0
+    while True:
+        try:
+            if transaction == "savepoint":
+                with conn.begin_nested():
+                    previous = None
+                    if policy.lock_timeout is not None:
+                        previous = set_lock_timeout(conn, policy.lock_timeout)
+                    attempt()
+                    if previous is not None:
+                        set_lock_timeout(conn, previous)
+            elif transaction == "block":
+                execute_statement(conn, "transaction", "BEGIN")
+                try:
+                    if policy.lock_timeout is not None:
+                        set_lock_timeout(conn, policy.lock_timeout)
+                    attempt()
+                except BaseException:
+                    execute_statement(conn, "transaction", "ROLLBACK")
+                    raise
+                execute_statement(conn, "transaction", "COMMIT")
+            else:
+                previous = None
+                if policy.lock_timeout is not None:
+                    previous = set_lock_timeout(conn, policy.lock_timeout, local=False)
+                try:
+                    attempt()
+                finally:
+                    if previous is not None:
+                        set_lock_timeout(conn, previous, local=False)
+            return
+        except sqlalchemy.exc.DBAPIError as error:
+            if not is_lock_not_available(error):
+                raise
+            delay = min(LOCK_RETRY_MAX_DELAY, LOCK_RETRY_BASE_DELAY * 2 ** attempt_number)
+            delay *= random.uniform(0.5, 1.0)
+            if policy.deadline is not None:
+                delay = min(delay, policy.deadline - time.monotonic())
+            if attempt_number >= policy.retries or delay < 0:
+                raise EnumLockTimeoutError(
+                    f"could not acquire locks after {attempt_number + 1} attempt(s): {error.orig}"
+                ) from error
+            attempt_number += 1
+            logger.info("lock not available, retrying in %.2fs (attempt %d)", delay, attempt_number + 1)
+            time.sleep(delay)
+
+
+def lock_tables(conn, table_names):
+    """
+    Take ACCESS EXCLUSIVE locks on `table_names` up front, in OID order so
+    that concurrent operations can't deadlock, failing immediately (NOWAIT)
+    rather than queueing application queries behind a waiting lock.
+    """
+    if not table_names:
+        return
+    sql = """
+        SELECT t.name
+        FROM unnest(CAST(:table_names AS text[])) AS t(name)
+        ORDER BY to_regclass(t.name)::oid
+    """
+    ordered = [r[0] for r in execute_statement(conn, "catalog", sql, dict(table_names=list(table_names)))]
+    execute_statement(conn, "lock", f"LOCK TABLE {', '.join(ordered)} IN ACCESS EXCLUSIVE MODE NOWAIT")
+
+
+@dataclass
+class EnumColumn:
+    """
+    A column whose type depends on an enum, found by get_enum_columns().
+    """
+    schema: str
+    table_name: str
+    column_name: str
+    # "scalar" for the enum itself, "array" for an array of it, "domain" for
+    # a domain over either or an array of such a domain
+    kind: str
+    # pg_class.relkind of the relation holding the column
+    relkind: str
+
+
+def get_enum_columns(conn, schema, name):
+    """
+    Find every column that depends on enum `{schema}.{name}`, with a single
+    catalog query: columns of the enum type itself, of its array type, and
+    of domains (or arrays of domains) over it, in any schema. Columns
+    inherited from a parent table, including partitions, are left out since
+    altering the parent converts them too.
+    :returns list:
+        EnumColumn instances, ordered by schema, table and column position.
+    """
+    sql = """
+        WITH RECURSIVE types(oid, typarray, kind) AS (
+            SELECT t.oid, t.typarray, 'scalar'
+            FROM pg_catalog.pg_type t
+            JOIN pg_catalog.pg_namespace n ON n.oid = t.typnamespace
+            WHERE n.nspname = :schema AND t.typname = :name
+        UNION
+            SELECT
+                d.oid,
+                d.typarray,
+                CASE WHEN d.typtype = 'd' OR types.kind = 'domain' THEN 'domain' ELSE 'array' END
+            FROM types
+            JOIN pg_catalog.pg_type d ON d.oid = types.typarray OR d.typbasetype = types.oid
+        )
+        SELECT n.nspname, c.relname, a.attname, types.kind, c.relkind
+        FROM pg_catalog.pg_attribute a
+        JOIN types ON types.oid = a.atttypid
+        JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        WHERE
+            a.attnum > 0
+            AND NOT a.attisdropped
+            AND a.attinhcount = 0
+            AND c.relkind NOT IN ('i', 'I')
+        ORDER BY n.nspname, c.relname, a.attnum
+    """
+    return [
+        EnumColumn(*row)
+        for row in execute_statement(conn, "catalog", sql, dict(schema=schema, name=name))
+    ]
+
+
+def plan_enum_columns(conn, schema, name):
+    """
+    Discover the columns to convert when enum `{schema}.{name}` is replaced.
+    :returns tuple:
+        (affected_columns, array_columns): (table name, column name) pairs
+        with schema-qualified table names, and the subset of those pairs
+        holding arrays of the enum.
+    :raises SyncEnumValuesError:
+        If a column can't be converted by altering its table: columns of
+        domains, attributes of composite types, and columns of views or
+        materialized views. Raised before anything is changed, since the old type could
+        otherwise not be dropped at the end.
+    """
+    quote = conn.dialect.identifier_preparer.quote
+    affected_columns = []
+    array_columns = set()
+    unsupported = []
+    for column in get_enum_columns(conn, schema, name):
+        pair = (f"{quote(column.schema)}.{quote(column.table_name)}", column.column_name)
+        if column.kind == "domain" or column.relkind in ("v", "m", "c"):
+            unsupported.append(f"{pair[0]}.{pair[1]} ({column.kind}, relkind {column.relkind!r})")
+            continue
+        affected_columns.append(pair)
+        if column.kind == "array":
+            array_columns.add(pair)
+    if unsupported:
+        raise SyncEnumValuesError(
+            f"cannot replace enum {schema}.{name}, these columns depend on it but can't be "
+            f"converted automatically: {', '.join(unsupported)}"
+        )
+    return affected_columns, array_columns
+
+
+def enum_column_type(schema, name, is_array):
+    """
+    Return the type and USING cast converting a column to `{schema}.{name}`
+    or, when `is_array`, to an array of it.
+    """
+    if is_array:
+        return f"{schema}.{name}[]", f"::text[]::{schema}.{name}[]"
+    return f"{schema}.{name}", f"::text::{schema}.{name}"
+
+
+def rewrite_enum_columns(conn, schema, name, affected_columns, array_columns=()):
+    """
+    Convert every affected column to the new `{schema}.{name}` type in place,
+    or to an array of it for the (table name, column name) pairs in
+    `array_columns`. Each table is rewritten once, under an ACCESS EXCLUSIVE
+    lock. Column names are unquoted, as in the catalog.
+    """
+    quote = conn.dialect.identifier_preparer.quote
+    # One ALTER TABLE per table, so a table holding several columns of this
+    # enum is only rewritten once.
+    for table_name, column_names in group_columns_by_table(affected_columns).items():
+        alter_columns = []
+        for column_name in column_names:
+            column_type, cast = enum_column_type(schema, name, (table_name, column_name) in array_columns)
+            column = quote(column_name)
+            alter_columns.append(f"ALTER COLUMN {column} TYPE {column_type} USING {column}{cast}")
+        execute_statement(
+            conn, "alter_table", f"ALTER TABLE {table_name} {', '.join(alter_columns)}", table_name=table_name
+        )
+
+
+@dataclass
+class JournalEntry:
+    """
+    A row of the journal table, for an enum being converted.
+    """
+    # "converted" for a table converted by convert_tables_resumably(),
+    # "partition" for a detached partition still to convert and attach,
+    # "index" for an index dropped for the rewrite and still to rebuild
+    step: str
+    # Schema-qualified table or index name
+    object_name: str
+    # What is needed to finish the step, decoded from JSON
+    detail: Optional[dict]
+
+
+def create_journal(conn, schema):
+    """
+    Create the journal table of `schema`, unless it exists already.
+    """
+    execute_statement(
+        conn, "journal_table",
+        f"CREATE TABLE IF NOT EXISTS {schema}.{JOURNAL_TABLE} ("
+        f"enum_name text NOT NULL, step text NOT NULL, object_name text NOT NULL, detail text, "
+        f"recorded_at timestamptz NOT NULL DEFAULT now(), PRIMARY KEY (enum_name, step, object_name))",
+    )
+
+
+def record_journal_entry(conn, schema, name, step, object_name, detail=None):
+    """
+    Record a JournalEntry for enum `{schema}.{name}`, replacing any entry for
+    the same step and object.
+    """
+    execute_statement(
+        conn, "journal",
+        f"INSERT INTO {schema}.{JOURNAL_TABLE} (enum_name, step, object_name, detail) "
+        f"VALUES (:name, :step, :object_name, :detail) "
+        f"ON CONFLICT (enum_name, step, object_name) DO UPDATE SET detail = EXCLUDED.detail, recorded_at = now()",
+        dict(name=name, step=step, object_name=object_name, detail=None if detail is None else json.dumps(detail)),
+    )
+
+
+def remove_journal_entry(conn, schema, name, step, object_name):
+    """
+    Remove the JournalEntry of enum `{schema}.{name}` for a finished step.
+    """
+    execute_statement(
+        conn, "journal",
+        f"DELETE FROM {schema}.{JOURNAL_TABLE} WHERE enum_name = :name AND step = :step "
+        f"AND object_name = :object_name",
+        dict(name=name, step=step, object_name=object_name),
+    )
+
+
+def get_journal_entries(conn, schema, name, step=None):
+    """
+    Read the JournalEntry list of enum `{schema}.{name}`, optionally only for
+    `step`, in the order they were recorded.
+    :returns list:
+        JournalEntry instances; empty when the journal table doesn't exist.
+    """
+    journal = f"{schema}.{JOURNAL_TABLE}"
+    if execute_statement(conn, "catalog", "SELECT to_regclass(:journal)", dict(journal=journal)).scalar() is None:
+        return []
+    sql = f"SELECT step, object_name, detail FROM {journal} WHERE enum_name = :name"
+    params = dict(name=name)
+    if step is not None:
+        sql += " AND step = :step"
+        params["step"] = step
+    rows = execute_statement(conn, "journal", sql + " ORDER BY recorded_at, object_name", params)
+    return [
+        JournalEntry(step, object_name, None if detail is None else json.loads(detail))
+        for step, object_name, detail in rows
+    ]
+
+
+def finish_journal(conn, schema, name):
+    """
+    Drop `{schema}.{name}_old` and the journal entries of enum
+    `{schema}.{name}`, and the journal table once no other enum of the schema
+    needs it.
+    """
+    journal = f"{schema}.{JOURNAL_TABLE}"
+    execute_statement(conn, "drop_type", f"DROP TYPE IF EXISTS {schema}.{name}_old")
+    if execute_statement(conn, "catalog", "SELECT to_regclass(:journal)", dict(journal=journal)).scalar() is None:
+        return
+    execute_statement(conn, "journal", f"DELETE FROM {journal} WHERE enum_name = :name", dict(name=name))
+    # Conversions of other enums of the schema may still need it.
+    remaining = execute_statement(conn, "journal", f"SELECT count(*) FROM {journal}").scalar()
+    if not remaining:
+        execute_statement(conn, "journal_table", f"DROP TABLE {journal}")
+
+
+@dataclass
+class Partition:
+    """
+    A partition of a partitioned table, as found by get_partitions().
+    """
+    # Schema-qualified and quoted
+    table_name: str
+    relname: str
+    # pg_class.relkind; "p" for a partition that is itself partitioned
+    relkind: str
+    # FOR VALUES ... clause, or DEFAULT
+    bound: str
+    # Expression implied by the bound, None for a lone default partition
+    constraint: Optional[str]
+
+    @property
+    def is_default(self):
+        return self.bound == "DEFAULT"
+
+
+def get_partitions(conn, table_names):
+    """
+    List the partitions of every partitioned table of `table_names` with one
+    catalog query.
+    :returns dict:
+        Mapping of partitioned table name to its Partition instances, the
+        default partition last. Tables of `table_names` that aren't
+        partitioned are left out.
+    """
+    sql = """
+        SELECT
+            t.table_name,
+            n.nspname,
+            c.relname,
+            c.relkind,
+            pg_catalog.pg_get_expr(c.relpartbound, c.oid),
+            pg_catalog.pg_get_partition_constraintdef(c.oid)
+        FROM unnest(CAST(:table_names AS text[])) WITH ORDINALITY AS t(table_name, position)
+        JOIN pg_catalog.pg_class p ON p.oid = CAST(t.table_name AS regclass)
+        LEFT JOIN pg_catalog.pg_inherits i ON i.inhparent = p.oid
+        LEFT JOIN pg_catalog.pg_class c ON c.oid = i.inhrelid
+        LEFT JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        WHERE p.relkind = 'p'
+        ORDER BY t.position, pg_catalog.pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT', n.nspname, c.relname
+    """
+    quote = conn.dialect.identifier_preparer.quote
+    partitions = {}
+    rows = execute_statement(conn, "catalog", sql, dict(table_names=list(table_names)))
+    for table_name, schema, relname, relkind, bound, constraint in rows:
+        partitions.setdefault(table_name, [])
+        if relname is not None:
+            partitions[table_name].append(
+                Partition(f"{quote(schema)}.{quote(relname)}", relname, relkind, bound, constraint)
+            )
+    return partitions
+
+
+def convert_partition(
+    conn, schema, name, table_name, column_names, partition, policy=None, array_columns=(), journaled=False
+):
+    """
+    Convert `column_names` of `partition`, detached from partitioned table
+    `table_name` whose columns already have the new `{schema}.{name}` type,
+    and attach it back. The partition is rewritten under its own ACCESS
+    EXCLUSIVE lock, together with a CHECK constraint matching its bound so
+    that attaching it doesn't scan it again. Pairs of `array_columns` are
+    keyed by `table_name`. When `journaled`, the partition's "partition"
+    JournalEntry is removed as it is attached.
+
+    A partition that is attached already is skipped, and one whose columns
+    no longer use `{schema}.{name}_old` is only attached, so this can be
+    called again to finish a conversion that failed part way.
+    """
+    state_sql = """
+        SELECT
+            EXISTS (
+                SELECT 1
+                FROM pg_catalog.pg_inherits
+                WHERE inhrelid = CAST(:partition AS regclass) AND inhparent = CAST(:table_name AS regclass)
+            ),
+            EXISTS (
+                SELECT 1
+                FROM pg_catalog.pg_attribute a
+                JOIN pg_catalog.pg_type t ON a.atttypid IN (t.oid, t.typarray)
+                WHERE
+                    a.attrelid = CAST(:partition AS regclass)
+                    AND a.attname = ANY(CAST(:column_names AS text[]))
+                    AND t.oid = pg_catalog.to_regtype(:old_type)
+            )
+    """
+    params = dict(
+        partition=partition.table_name, table_name=table_name, column_names=list(column_names),
+        old_type=f"{schema}.{name}_old",
+    )
+    attached, needs_conversion = execute_statement(
+        conn, "catalog", state_sql, params, table_name=partition.table_name
+    ).fetchone()
+    if attached:
+        logger.info("partition %s of %s is already converted", partition.table_name, table_name)
+        if journaled:
+            def forget():
+                remove_journal_entry(conn, schema, name, "partition", partition.table_name)
+
+            run_with_lock_retries(conn, policy, forget, transaction="block")
+        return
+
+    check_name = re.sub(r"\W+", "_", partition.relname).strip("_") + f"_{name}_bound"
+
+    def execute(kind, sql):
+        execute_statement(conn, kind, sql, table_name=partition.table_name)
+
+    def convert():
+        alter = [f"DROP CONSTRAINT IF EXISTS {check_name}"]
+        if needs_conversion:
+            quote = conn.dialect.identifier_preparer.quote
+            for column_name in column_names:
+                column_type, cast = enum_column_type(schema, name, (table_name, column_name) in array_columns)
+                column = quote(column_name)
+                alter.append(f"ALTER COLUMN {column} TYPE {column_type} USING {column}{cast}")
+        if partition.constraint is not None:
+            alter.append(f"ADD CONSTRAINT {check_name} CHECK ({partition.constraint})")
+        execute("alter_table", f"ALTER TABLE {partition.table_name} {', '.join(alter)}")
+
+    def attach():
+        execute("alter_table", f"ALTER TABLE {table_name} ATTACH PARTITION {partition.table_name} {partition.bound}")
+        execute("alter_table", f"ALTER TABLE {partition.table_name} DROP CONSTRAINT IF EXISTS {check_name}")
+        if journaled:
+            remove_journal_entry(conn, schema, name, "partition", partition.table_name)
+
+    run_with_lock_retries(conn, policy, convert, transaction="block")
+    run_with_lock_retries(conn, policy, attach, transaction="block")
+
+
+def convert_partitions(
+    conn, schema, name, table_name, column_names, partitions, workers=1, policy=None, array_columns=(),
+    journaled=False,
+):
+    """
+    Convert and attach back every partition of `partitions` with
+    convert_partition(), the default partition last so that attaching the
+    others never scans it.
+    :param int workers:
+        With more than one worker, partitions other than the default one are
+        converted concurrently on separate connections from `conn.engine`,
+        on threads or as asyncio tasks as check_values_unused() does.
+    :param bool journaled:
+        The partitions were recorded in the journal table when they were
+        detached; see convert_partition().
+    """
+    def convert(partition_conn, partition):
+        convert_partition(
+            partition_conn, schema, name, table_name, column_names, partition, policy, array_columns, journaled
+        )
+
+    def convert_on_new_connection(partition_conn, partition):
+        # Each partition is converted in its own BEGIN/COMMIT block.
+        execute_statement(partition_conn, "transaction", "COMMIT")
+        convert(partition_conn, partition)
+
+    def convert_on_thread(partition):
+        with conn.engine.connect() as partition_conn, operation_context(schema, name):
+            convert_on_new_connection(partition_conn, partition)
+
+    others = [partition for partition in partitions if not partition.is_default]
+    try:
+        if workers > 1 and len(others) > 1 and is_async_dialect(conn):
+            run_on_async_connections(conn, workers, [
+                lambda partition_conn, partition=partition: convert_on_new_connection(partition_conn, partition)
+                for partition in others
+            ])
+        elif workers > 1 and len(others) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(convert_on_thread, others))
+        else:
+            for partition in others:
+                convert(conn, partition)
+        for partition in partitions:
+            if partition.is_default:
+                convert(conn, partition)
+    except BaseException:
+        if journaled:
+            logger.error(
+                "converting the partitions of %s failed; partitions not attached back yet are recorded in %s.%s "
+                "and running the operation again finishes them", table_name, schema, JOURNAL_TABLE,
+            )
+        else:
+            logger.error(
+                "converting the partitions of %s failed; partitions not attached back yet can be finished by "
+                "calling convert_partitions() again", table_name,
+            )
+        raise
+
+
+def convert_tables_resumably(
+    conn, schema, name, values, affected_columns, array_columns=(), policy=None, resuming=False
+):
+    """
+    Replace enum `{schema}.{name}` by a new type with `values` and convert
+    `affected_columns` to it one table at a time, each in its own
+    transaction that also records the table in the journal table
+    `{schema}.alembic_enum_sync_journal`. `{name}_old` is dropped, with the
+    journal, once every table is converted.
+
+    Unless `resuming`, the type is first renamed to `{name}_old` and the new
+    one created and committed, so that both types exist while the tables are
+    converted. Tables already in the journal are skipped, so calling this
+    again with `resuming` after a failure carries on from the first table
+    that wasn't converted.
+    """
+    def start():
+        create_journal(conn, schema)
+
+    execute_statement(conn, "transaction", "COMMIT")
+    run_with_lock_retries(conn, policy, start, transaction="block")
+
+    if not resuming:
+        prebuilt = len(values) > ENUM_VALUES_PER_STATEMENT
+        if prebuilt:
+            create_enum_type(conn, schema, f"{name}_new", values, policy, replace=True)
+
+        def replace_type():
+            execute_statement(conn, "rename_type", f"ALTER TYPE {schema}.{name} RENAME TO {name}_old")
+            if prebuilt:
+                execute_statement(conn, "rename_type", f"ALTER TYPE {schema}.{name}_new RENAME TO {name}")
+            else:
+                values_sql = ", ".join(enum_literal(value) for value in values)
+                execute_statement(conn, "create_type", f"CREATE TYPE {schema}.{name} AS ENUM({values_sql})")
+
+        try:
+            run_with_lock_retries(conn, policy, replace_type, transaction="block")
+        except BaseException:
+            if prebuilt:
+                discard_enum_type(conn, schema, f"{name}_new")
+            raise
+
+    converted = {entry.object_name for entry in get_journal_entries(conn, schema, name, "converted")}
+    for table_name, column_names in group_columns_by_table(affected_columns).items():
+        if table_name in converted:
+            logger.info("%s was converted by an earlier run", table_name)
+            continue
+
+        def convert_table():
+            if policy is not None:
+                lock_tables(conn, [table_name])
+            rewrite_enum_columns(
+                conn, schema, name, [(table_name, column_name) for column_name in column_names], array_columns
+            )
+            record_journal_entry(conn, schema, name, "converted", table_name)
+
+        run_with_lock_retries(conn, policy, convert_table, transaction="block")
+
+    def finish():
+        finish_journal(conn, schema, name)
+
+    run_with_lock_retries(conn, policy, finish, transaction="block")
+
+
+def resume_enum_conversion(
+    conn, schema, name, values, policy=None, preflight=True, preflight_workers=1, partition_workers=1,
+    maintenance_work_mem=None, batch_size=DEFAULT_BATCH_SIZE,
+):
+    """
+    Finish a conversion of enum `{schema}.{name}` to `values` that failed
+    after its type swap was committed, from the work left in the journal
+    table: partitions still detached are converted and attached back, tables
+    converted online are taken up again with online_convert_table(), over
+    any shadow columns and trigger already there, and dropped indexes are
+    rebuilt. Then `{name}_old` and the journal are dropped. With
+    `preflight`, the columns still using `{name}_old` are first checked for
+    removed values, as check_values_unused() does.
+    :raises SyncEnumValuesError:
+        If the enum doesn't have `values`, i.e. the unfinished conversion was
+        to other values, or if columns the journal doesn't account for still
+        use `{name}_old`.
+    """
+    current_values = get_enum_values(conn, schema, name)
+    if current_values != frozenset(values):
+        raise SyncEnumValuesError(
+            f"an unfinished conversion of {schema}.{name} was to other values than {sorted(values)}: "
+            f"{sorted(current_values or ())}"
+        )
+
+    partitions_by_table = {}
+    online_tables = []
+    pending_columns = set()
+    indexes = []
+    for entry in get_journal_entries(conn, schema, name):
+        if entry.step == "index":
+            indexes.append((entry.detail["table_name"], entry.object_name, entry.detail["definition"]))
+        elif entry.step == "online":
+            online_tables.append(entry)
+            pending_columns.update((entry.object_name, column_name) for column_name in entry.detail["column_names"])
+        elif entry.step == "partition":
+            partitions_by_table.setdefault(entry.detail["table_name"], []).append(entry)
+            pending_columns.update((entry.object_name, column_name) for column_name in entry.detail["column_names"])
+
+    old_values = get_enum_values(conn, schema, f"{name}_old")
+    if old_values is not None:
+        old_columns, old_array_columns = plan_enum_columns(conn, schema, f"{name}_old")
+        unexpected = [f"{table_name}.{column_name}" for table_name, column_name in old_columns
+                      if (table_name, column_name) not in pending_columns]
+        if unexpected:
+            raise SyncEnumValuesError(
+                f"cannot finish converting {schema}.{name}: {', '.join(unexpected)} still use "
+                f"{schema}.{name}_old; if the conversion was resumable, run it again with resumable=True"
+            )
+        if preflight:
+            check_values_unused(
+                conn, schema, f"{name}_old", old_columns, old_values - frozenset(values),
+                workers=preflight_workers, array_columns=old_array_columns,
+            )
+
+    logger.info("finishing the conversion of %s.%s", schema, name)
+    execute_statement(conn, "transaction", "COMMIT")
+    for table_name, entries in partitions_by_table.items():
+        detail = entries[0].detail
+        partitions = [
+            Partition(
+                entry.object_name, entry.detail["relname"], entry.detail["relkind"], entry.detail["bound"],
+                entry.detail["constraint"],
+            )
+            for entry in entries
+        ]
+        convert_partitions(
+            conn, schema, name, table_name, detail["column_names"], partitions, workers=partition_workers,
+            policy=policy, array_columns={(table_name, column_name) for column_name in detail["array_column_names"]},
+            journaled=True,
+        )
+    for entry in online_tables:
+        detail = entry.detail
+        online_convert_table(
+            conn, schema, name, entry.object_name, detail["column_names"], detail["primary_key"],
+            detail["columns"], batch_size, policy=policy,
+            array_columns={(entry.object_name, column_name) for column_name in detail["array_column_names"]},
+            maintenance_work_mem=maintenance_work_mem,
+        )
+    rebuild_indexes_concurrently(conn, schema, name, indexes, policy, maintenance_work_mem)
+
+    def finish():
+        finish_journal(conn, schema, name)
+
+    run_with_lock_retries(conn, policy, finish, transaction="block")
+
+
+@dataclass
+class TableCost:
+    """
+    Size of a table, as read by get_table_costs(). Converting a column
+    rewrites the heap, its TOAST table and every index.
+    """
+    table_name: str
+    # pg_class.relpages and reltuples, as of the last VACUUM or ANALYZE
+    pages: int
+    tuples: float
+    table_bytes: int
+    index_bytes: int
+    toast_bytes: int
+
+    @property
+    def total_bytes(self):
+        return self.table_bytes + self.index_bytes + self.toast_bytes
+
+
+@dataclass
+class TablePlan:
+    cost: TableCost
+    column_names: List[str]
+    # REWRITE or ONLINE; None when the table is over the size limit
+    strategy: Optional[str]
+
+
+@dataclass
+class RewritePlan:
+    """
+    How the columns of enum `{schema}.{name}` would be converted, as returned
+    by plan_enum_rewrite().
+    """
+    schema: str
+    name: str
+    tables: List[TablePlan]
+
+    @property
+    def refused(self):
+        return [table for table in self.tables if table.strategy is None]
+
+    def format(self):
+        """
+        Describe the plan, one line per table.
+        """
+        total = sum(table.cost.total_bytes for table in self.tables)
+        lines = [f"{self.schema}.{self.name}: {len(self.tables)} table(s), {format_bytes(total)} to convert"]
+        for table in self.tables:
+            cost = table.cost
+            lines.append(
+                f"  {cost.table_name} ({', '.join(table.column_names)}): {format_bytes(cost.total_bytes)} "
+                f"(heap {format_bytes(cost.table_bytes)}, indexes {format_bytes(cost.index_bytes)}, "
+                f"toast {format_bytes(cost.toast_bytes)}), ~{max(cost.tuples, 0):.0f} rows "
+                f"-> {table.strategy or 'refused'}"
+            )
+        return "\n".join(lines)
+
+
+def format_bytes(size):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+
+def get_table_costs(conn, table_names):
+    """
+    Read the size of every table of `table_names` with one catalog query.
+    Partitions and inheritance children are added to their parent, since
+    altering a column of the parent rewrites them too.
+    :returns dict:
+        Mapping of table name to TableCost, in the order of `table_names`.
+    """
+    sql = """
+        WITH RECURSIVE tables(table_name, position, oid) AS (
+            SELECT t.table_name, t.position, CAST(t.table_name AS regclass)::oid
+            FROM unnest(CAST(:table_names AS text[])) WITH ORDINALITY AS t(table_name, position)
+        UNION ALL
+            SELECT tables.table_name, tables.position, i.inhrelid
+            FROM tables
+            JOIN pg_catalog.pg_inherits i ON i.inhparent = tables.oid
+        )
+        SELECT
+            t.table_name,
+            sum(c.relpages)::bigint,
+            sum(greatest(c.reltuples, 0)),
+            sum(pg_catalog.pg_relation_size(c.oid))::bigint,
+            sum(pg_catalog.pg_indexes_size(c.oid))::bigint,
+            sum(COALESCE(pg_catalog.pg_total_relation_size(NULLIF(c.reltoastrelid, 0)), 0))::bigint
+        FROM tables t
+        JOIN pg_catalog.pg_class c ON c.oid = t.oid
+        GROUP BY t.table_name, t.position
+        ORDER BY t.position
+    """
+    return {
+        row[0]: TableCost(*row)
+        for row in execute_statement(conn, "catalog", sql, dict(table_names=list(table_names)))
+    }
+
+
+def plan_enum_rewrite(
+    conn, schema, name, affected_columns, strategy=REWRITE, online_above_bytes=DEFAULT_ONLINE_ABOVE_BYTES,
+    refuse_above_bytes=None,
+):
+    """
+    Estimate the cost of converting `affected_columns` to a new
+    `{schema}.{name}` type and pick a strategy for each table.
+    :param str strategy:
+        REWRITE or ONLINE to use that strategy for every table, or AUTO to
+        use ONLINE only for tables over `online_above_bytes`.
+    :param int refuse_above_bytes:
+        Tables over this size are marked as refused, whatever the strategy.
+    :returns RewritePlan:
+    """
+    by_table = group_columns_by_table(affected_columns)
+    tables = []
+    for table_name, cost in get_table_costs(conn, by_table).items():
+        if refuse_above_bytes is not None and cost.total_bytes > refuse_above_bytes:
+            table_strategy = None
+        elif strategy == AUTO:
+            table_strategy = ONLINE if cost.total_bytes > online_above_bytes else REWRITE
+        else:
+            table_strategy = strategy
+        tables.append(TablePlan(cost, by_table[table_name], table_strategy))
+    return RewritePlan(schema, name, tables)
+
+
+def find_value_in_use(conn, schema, name, table_name, column_name, values, is_array=False):
+    """
+    Return one of `values` that is still stored in `table_name.column_name`,
+    or None. Values that pg_stats lists among the column's most common values
+    (or elements, for arrays) are probed first, since they are found almost
+    immediately. Probes compare against the enum type itself, so an index on
+    the column is used when one exists.
+    """
+    stats_sql = """
+        SELECT COALESCE(s.most_common_elems::text::text[], s.most_common_vals::text::text[])
+        FROM pg_catalog.pg_stats s
+        JOIN pg_catalog.pg_class c ON c.relname = s.tablename
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace AND n.nspname = s.schemaname
+        WHERE c.oid = CAST(:table_name AS regclass) AND s.attname = :column_name
+    """
+    column = conn.dialect.identifier_preparer.quote(column_name)
+    if is_array:
+        probe_sql = (
+            f"SELECT element::text FROM {table_name} CROSS JOIN LATERAL unnest({column}) AS element "
+            f"WHERE {column} && CAST(:values AS {schema}.{name}[]) "
+            f"AND element = ANY(CAST(:values AS {schema}.{name}[])) LIMIT 1"
+        )
+    else:
+        probe_sql = (
+            f"SELECT {column}::text FROM {table_name} "
+            f"WHERE {column} = ANY(CAST(:values AS {schema}.{name}[])) LIMIT 1"
+        )
+    params = dict(table_name=table_name, column_name=column_name)
+    most_common = set(
+        execute_statement(conn, "catalog", stats_sql, params, table_name=table_name).scalar() or ()
+    )
+    common = sorted(value for value in values if value in most_common)
+    uncommon = sorted(value for value in values if value not in most_common)
+    for candidates in (common, uncommon):
+        if candidates:
+            row = execute_statement(
+                conn, "preflight", probe_sql, dict(values=candidates), table_name=table_name
+            ).first()
+            if row is not None:
+                return row[0]
+    return None
+
+
+def is_async_dialect(conn):
+    """
+    Return True if `conn`, a Connection or Engine, runs on an asyncio driver
+    such as asyncpg, i.e. it is the sync facade of an AsyncConnection or
+    AsyncEngine.
+    """
+    return getattr(conn.dialect, "is_async", False)
+
+
+def run_on_async_connections(conn, workers, functions):
+    """
+    Call every function of `functions` with a connection of its own from the
+    engine of `conn`, an asyncio driver connection, running up to `workers`
+    of them concurrently as asyncio tasks.
+    Must be called from code run through AsyncConnection.run_sync(), like an
+    async env.py's migrations, which lets it wait on the event loop.
+    :returns list:
+        The results of `functions`, in order.
+    """
+    async_engine = AsyncEngine(conn.engine)
+    semaphore = asyncio.Semaphore(workers)
+
+    async def run(function):
+        async with semaphore:
+            async with async_engine.connect() as async_conn:
+                return await async_conn.run_sync(function)
+
+    async def run_all():
+        return await asyncio.gather(*[run(function) for function in functions])
+
+    return sqlalchemy.util.await_only(run_all())
+
+
+def check_values_unused(conn, schema, name, affected_columns, values, workers=1, array_columns=()):
+    """
+    Make sure no affected column still stores one of `values`, before any
+    lock is taken or any table is rewritten. Pairs in `array_columns` hold
+    arrays of the enum.
+    :param int workers:
+        With more than one worker, tables are probed concurrently on separate
+        connections from `conn.engine`: on threads, or as asyncio tasks when
+        the engine uses an asyncio driver such as asyncpg. Those connections
+        can't see
+        uncommitted changes of the migration, such as rows deleted earlier in
+        the same transaction.
+    :raises EnumValueInUseError:
+        For the first column found to still use a value.
+    """
+    # Values the migration expected but the enum doesn't have, as on a
+    # database that drifted, can't be stored and would fail the probe's cast.
+    values = set(values)
+    if values:
+        values &= get_enum_values(conn, schema, name) or frozenset()
+    if not values:
+        return
+
+    def probe_table(conn, table_name, column_names):
+        for column_name in column_names:
+            value = find_value_in_use(
+                conn, schema, name, table_name, column_name, values,
+                is_array=(table_name, column_name) in array_columns,
+            )
+            if value is not None:
+                return column_name, value
+        return None
+
+    def probe_table_on_new_connection(table_name, column_names):
+        with conn.engine.connect() as probe_conn, operation_context(schema, name):
+            return probe_table(probe_conn, table_name, column_names)
+
+    by_table = group_columns_by_table(affected_columns)
+    if workers > 1 and len(by_table) > 1 and is_async_dialect(conn):
+        results = run_on_async_connections(conn, workers, [
+            lambda probe_conn, table_name=table_name, column_names=column_names: probe_table(
+                probe_conn, table_name, column_names
+            )
+            for table_name, column_names in by_table.items()
+        ])
+    elif workers > 1 and len(by_table) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(probe_table_on_new_connection, by_table, by_table.values()))
+    else:
+        results = (probe_table(conn, table_name, column_names) for table_name, column_names in by_table.items())
+
+    for table_name, result in zip(by_table, results):
+        if result is not None:
+            raise EnumValueInUseError(table_name, *result)
+
+
+def get_primary_key_column(conn, table_name):
+    """
+    Return the name of the single-column primary key of `table_name`.
+    :raises SyncEnumValuesError:
+        If the table has no primary key, or a composite one.
+    """
+    sql = """
+        SELECT a.attname
+        FROM pg_catalog.pg_index i
+        JOIN pg_catalog.pg_attribute a
+            ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+        WHERE i.indrelid = CAST(:table_name AS regclass) AND i.indisprimary
+    """
+    columns = [
+        r[0] for r in execute_statement(conn, "catalog", sql, dict(table_name=table_name), table_name=table_name)
+    ]
+    if len(columns) != 1:
+        raise SyncEnumValuesError(
+            f"the online strategy needs a single-column primary key on {table_name}"
+        )
+    return columns[0]
+
+
+def get_column_dependents(conn, table_name, column_names):
+    """
+    Describe the columns of `table_name` ahead of an online conversion.
+    :returns dict:
+        Mapping of column name to a dict with the keys "not_null" (bool),
+        "default" (default expression or None) and "indexes" (list of
+        (index name, index definition) pairs for plain indexes on the column).
+    :raises SyncEnumValuesError:
+        If anything other than a default or a plain index depends on one of
+        the columns (views, constraints, constraint-backed indexes, ...),
+        since those cannot survive the column swap.
+    """
+    columns_sql = """
+        SELECT a.attname, a.attnum, a.attnotnull, pg_catalog.pg_get_expr(d.adbin, d.adrelid)
+        FROM pg_catalog.pg_attribute a
+        LEFT JOIN pg_catalog.pg_attrdef d
+            ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+        WHERE
+            a.attrelid = CAST(:table_name AS regclass)
+            AND a.attname = ANY(CAST(:column_names AS text[]))
+    """
+    dependents_sql = """
+        SELECT
+            d.classid::regclass::text,
+            d.objid,
+            d.refobjsubid,
+            CASE WHEN d.classid = 'pg_catalog.pg_class'::regclass
+                THEN d.objid::regclass::text
+            END,
+            CASE WHEN d.classid = 'pg_catalog.pg_class'::regclass
+                THEN pg_catalog.pg_get_indexdef(d.objid)
+            END,
+            EXISTS (
+                SELECT 1 FROM pg_catalog.pg_constraint c WHERE c.conindid = d.objid
+            )
+        FROM pg_catalog.pg_depend d
+        WHERE
+            d.refclassid = 'pg_catalog.pg_class'::regclass
+            AND d.refobjid = CAST(:table_name AS regclass)
+            AND d.refobjsubid = ANY(CAST(:attnums AS int[]))
+            AND d.deptype IN ('n', 'a')
+    """
+    params = dict(table_name=table_name, column_names=list(column_names))
+    columns = {}
+    by_attnum = {}
+    for column_name, attnum, not_null, default in execute_statement(
+        conn, "catalog", columns_sql, params, table_name=table_name
+    ):
+        columns[column_name] = dict(not_null=not_null, default=default, indexes=[])
+        by_attnum[attnum] = column_name
+
+    params = dict(table_name=table_name, attnums=list(by_attnum))
+    for catalog, objid, attnum, index_name, index_definition, is_constraint in execute_statement(
+        conn, "catalog", dependents_sql, params, table_name=table_name
+    ):
+        column_name = by_attnum[attnum]
+        if catalog == "pg_attrdef":
+            continue
+        if catalog == "pg_class" and index_definition and not is_constraint:
+            columns[column_name]["indexes"].append((index_name, index_definition))
+            continue
+        raise SyncEnumValuesError(
+            f"the online strategy cannot convert {table_name}.{column_name}: "
+            f"it is referenced by an object in {catalog} (oid {objid})"
+        )
+    return columns
+
+
+def get_column_indexes(conn, table_name, column_names):
+    """
+    List the indexes of `table_name` using any of `column_names`, as a key
+    column or in an expression or predicate. Indexes backing a constraint are
+    left out, since they can't be dropped and recreated on their own, and so
+    are unique and exclusion indexes, which must keep enforcing their rule
+    while the table is rewritten.
+    :returns list:
+        (index name, index definition) pairs.
+    """
+    sql = """
+        SELECT DISTINCT i.indexrelid::regclass::text, pg_catalog.pg_get_indexdef(i.indexrelid)
+        FROM pg_catalog.pg_index i
+        JOIN pg_catalog.pg_depend d
+            ON d.classid = 'pg_catalog.pg_class'::regclass
+            AND d.objid = i.indexrelid
+            AND d.refclassid = 'pg_catalog.pg_class'::regclass
+            AND d.refobjid = i.indrelid
+        JOIN pg_catalog.pg_attribute a
+            ON a.attrelid = d.refobjid AND a.attnum = d.refobjsubid
+        WHERE
+            i.indrelid = CAST(:table_name AS regclass)
+            AND a.attname = ANY(CAST(:column_names AS text[]))
+            AND NOT i.indisunique
+            AND NOT i.indisexclusion
+            AND NOT EXISTS (
+                SELECT 1 FROM pg_catalog.pg_constraint c WHERE c.conindid = i.indexrelid
+            )
+        ORDER BY 1
+    """
+    params = dict(table_name=table_name, column_names=list(column_names))
+    return [tuple(row) for row in execute_statement(conn, "catalog", sql, params, table_name=table_name)]
+
+
+def rebuild_index_concurrently(
+    conn, table_name, index_name, index_definition, policy=None, maintenance_work_mem=None
+):
+    """
+    (Re)create index `index_name` from `index_definition` with CREATE INDEX
+    CONCURRENTLY, outside of any transaction, using `maintenance_work_mem`
+    for the build when given.
+    """
+    def create_index():
+        # A failed concurrent build leaves an invalid index behind.
+        execute_statement(
+            conn, "create_index", f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}", table_name=table_name
+        )
+        execute_statement(
+            conn, "create_index", index_definition.replace(" INDEX ", " INDEX CONCURRENTLY ", 1),
+            table_name=table_name,
+        )
+
+    if maintenance_work_mem is not None:
+        execute_statement(
+            conn, "transaction", f"SET maintenance_work_mem = {enum_literal(str(maintenance_work_mem))}"
+        )
+    try:
+        run_with_lock_retries(conn, policy, create_index, transaction="none")
+    finally:
+        if maintenance_work_mem is not None:
+            execute_statement(conn, "transaction", "RESET maintenance_work_mem")
+
+
+def rebuild_indexes_concurrently(conn, schema, name, indexes, policy=None, maintenance_work_mem=None):
+    """
+    Rebuild `indexes`, (table name, index name, index definition) triples
+    recorded as "index" JournalEntry rows of enum `{schema}.{name}`, with
+    rebuild_index_concurrently(), removing each entry once its index is
+    built. If a build fails, the definitions still to build are logged; they
+    stay in the journal, and running the operation again builds them.
+    """
+    for position, (table_name, index_name, index_definition) in enumerate(indexes):
+        try:
+            rebuild_index_concurrently(conn, table_name, index_name, index_definition, policy, maintenance_work_mem)
+        except BaseException:
+            logger.error(
+                "rebuilding the indexes dropped for %s.%s failed; these are recorded in %s.%s and running the "
+                "operation again builds them: %s", schema, name, schema, JOURNAL_TABLE,
+                "; ".join(definition for _, _, definition in indexes[position:]),
+            )
+            raise
+
+        def forget():
+            remove_journal_entry(conn, schema, name, "index", index_name)
+
+        run_with_lock_retries(conn, policy, forget, transaction="block")
+
+
+def online_convert_table(
+    conn, schema, name, table_name, column_names, primary_key, columns, batch_size, policy=None,
+    array_columns=(), maintenance_work_mem=None,
+):
+    """
+    Convert columns of `table_name` to the new `{schema}.{name}` type without
+    rewriting the table under a long lock:
+
+    1. add a shadow column of the new type per column, kept in sync with a
+       trigger;
+    2. backfill the shadow columns in primary key batches of `batch_size`
+       rows, each in its own transaction;
+    3. validate NOT NULL as a CHECK constraint, outside of any strong lock;
+    4. swap the columns in one short ACCESS EXCLUSIVE transaction;
+    5. rebuild plain indexes of the original columns concurrently, with
+       `maintenance_work_mem` when given.
+
+    `primary_key` and `columns` come from get_primary_key_column() and
+    get_column_dependents(), read before the old type was renamed. Columns
+    whose (table name, column name) pair is in `array_columns` become arrays
+    of the new type. Every step
+    waits for its locks according to the LockPolicy `policy`. Expects to run
+    after the new type has been created and committed, and commits as it
+    goes.
+
+    Steps 1 to 3 can be run again over what a failed run left behind. The
+    swap removes the table's "online" JournalEntry, recorded by
+    sync_enum_values() before the type was renamed, and records the indexes
+    it drops as "index" entries until they are rebuilt.
+    """
+    quote = conn.dialect.identifier_preparer.quote
+    column = {column_name: quote(column_name) for column_name in column_names}
+    shadow = {column_name: quote(f"{column_name}__{name}_new") for column_name in column_names}
+    not_null_check = {column_name: quote(f"{column_name}__{name}_new_not_null") for column_name in column_names}
+    key = quote(primary_key)
+    # table_name may be schema-qualified and quoted.
+    trigger_name = re.sub(r"\W+", "_", table_name).strip("_") + f"_{name}_sync"
+    function_name = f"{schema}.{trigger_name}"
+    types = {
+        column_name: enum_column_type(schema, name, (table_name, column_name) in array_columns)
+        for column_name in column_names
+    }
+
+    def execute(kind, sql, params=None):
+        return execute_statement(conn, kind, sql, params, table_name=table_name)
+
+    def in_transaction(*statements):
+        def attempt():
+            for kind, sql in statements:
+                execute(kind, sql)
+        run_with_lock_retries(conn, policy, attempt, transaction="block")
+
+    add_columns = ", ".join(
+        f"ADD COLUMN IF NOT EXISTS {shadow[column_name]} {types[column_name][0]}"
+        for column_name in column_names
+    )
+    assignments = " ".join(
+        f"NEW.{shadow[column_name]} := NEW.{column[column_name]}{types[column_name][1]};"
+        for column_name in column_names
+    )
+    in_transaction(
+        ("alter_table", f"ALTER TABLE {table_name} {add_columns}"),
+        (
+            "trigger",
+            f"CREATE OR REPLACE FUNCTION {function_name}() RETURNS trigger AS $$ "
+            f"BEGIN {assignments} RETURN NEW; END $$ LANGUAGE plpgsql",
+        ),
+        ("trigger", f"DROP TRIGGER IF EXISTS {trigger_name} ON {table_name}"),
+        (
+            "trigger",
+            f"CREATE TRIGGER {trigger_name} BEFORE INSERT OR UPDATE ON {table_name} "
+            f"FOR EACH ROW EXECUTE PROCEDURE {function_name}()",
+        ),
+    )
+
+    set_shadow = ", ".join(
+        f"{shadow[column_name]} = {column[column_name]}{types[column_name][1]}"
+        for column_name in column_names
+    )
+    batch_sql = (
+        f"WITH batch AS ("
+        f"SELECT {key} FROM {table_name} {{where}} ORDER BY {key} LIMIT :batch_size"
+        f") UPDATE {table_name} t SET {set_shadow} FROM batch "
+        f"WHERE t.{key} = batch.{key} RETURNING t.{key}"
+    )
+    last = None
+    while True:
+        if last is None:
+            sql, params = batch_sql.format(where=""), dict(batch_size=batch_size)
+        else:
+            sql = batch_sql.format(where=f"WHERE {key} > :last")
+            params = dict(batch_size=batch_size, last=last)
+        keys = []
+
+        def backfill_batch():
+            keys[:] = [r[0] for r in execute("backfill", sql, params)]
+
+        run_with_lock_retries(conn, policy, backfill_batch, transaction="block")
+        if not keys:
+            break
+        last = max(keys)
+
+    not_null = [column_name for column_name in column_names if columns[column_name]["not_null"]]
+    for column_name in not_null:
+        in_transaction((
+            "alter_table",
+            f"ALTER TABLE {table_name} DROP CONSTRAINT IF EXISTS {not_null_check[column_name]}, "
+            f"ADD CONSTRAINT {not_null_check[column_name]} CHECK ({shadow[column_name]} IS NOT NULL) NOT VALID",
+        ))
+        in_transaction((
+            "alter_table",
+            f"ALTER TABLE {table_name} VALIDATE CONSTRAINT {not_null_check[column_name]}",
+        ))
+
+    # Dropping the original columns drops their indexes.
+    indexes = {}
+    for column_name in column_names:
+        indexes.update(columns[column_name]["indexes"])
+
+    def swap_columns():
+        if policy is None:
+            execute("lock", f"LOCK TABLE {table_name} IN ACCESS EXCLUSIVE MODE")
+        else:
+            lock_tables(conn, [table_name])
+        execute("trigger", f"DROP TRIGGER {trigger_name} ON {table_name}")
+        execute("trigger", f"DROP FUNCTION {function_name}()")
+        drop_columns = ", ".join(f"DROP COLUMN {column[column_name]}" for column_name in column_names)
+        execute("alter_table", f"ALTER TABLE {table_name} {drop_columns}")
+        for column_name in column_names:
+            execute(
+                "alter_table", f"ALTER TABLE {table_name} RENAME COLUMN {shadow[column_name]} TO {column[column_name]}"
+            )
+            default = columns[column_name]["default"]
+            if default is not None:
+                # The default was read before the type was renamed, so any
+                # cast in it resolves to the new type.
+                execute(
+                    "alter_table", f"ALTER TABLE {table_name} ALTER COLUMN {column[column_name]} SET DEFAULT {default}"
+                )
+            if column_name in not_null:
+                # Backed by the validated CHECK constraint, so this doesn't
+                # scan the table on PostgreSQL 12+.
+                execute("alter_table", f"ALTER TABLE {table_name} ALTER COLUMN {column[column_name]} SET NOT NULL")
+                execute("alter_table", f"ALTER TABLE {table_name} DROP CONSTRAINT {not_null_check[column_name]}")
+        remove_journal_entry(conn, schema, name, "online", table_name)
+        for index_name, index_definition in indexes.items():
+            record_journal_entry(conn, schema, name, "index", index_name, dict(
+                table_name=table_name, definition=index_definition,
+            ))
+
+    run_with_lock_retries(conn, policy, swap_columns, transaction="block")
+    rebuild_indexes_concurrently(
+        conn, schema, name,
+        [(table_name, index_name, index_definition) for index_name, index_definition in indexes.items()],
+        policy, maintenance_work_mem,
+    )
+    execute("analyze", f"ANALYZE {table_name}")
+
+
+class EnumConnectionManager:
+    """
+    Hands out one dedicated connection per engine for the length of a
+    migration run, instead of a new connection per enum operation.
+    """
+    def __init__(self):
+        self.connections = {}
+        self.opened = 0
+
+    def connect(self, engine) -> sqlalchemy.engine.Connection:
+        """
+        Return the dedicated connection for `engine`, opening it on first use.
+        """
+        conn = self.connections.get(engine)
+        if conn is None or conn.closed:
+            conn = self.connections[engine] = engine.connect()
+            self.opened += 1
+        return conn
+
+    def close(self):
+        """
+        Close every connection handed out so far.
+        """
+        for conn in self.connections.values():
+            conn.close()
+        self.connections.clear()
+
+
+@contextmanager
+def managed_connections():
+    """
+    Reuse one connection per engine for every enum operation run within the
+    block, and close them when it exits. Meant to wrap
+    context.run_migrations() in env.py:
+
+        with alembic_autogenerate_enums.managed_connections():
+            context.run_migrations()
+
+    Only matters when the migration's bind is an Engine rather than a
+    Connection. Yields the EnumConnectionManager, whose `opened` attribute
+    counts the connections opened during the run.
     """
-    return DeclaredEnumValues({
-        r[0]: frozenset(r[1])
-        for r in conn.execute(sqlalchemy.text(sql), dict(schema=schema))
-    })
+    manager = EnumConnectionManager()
+    previous = getattr(_active, "manager", None)
+    _active.manager = manager
+    try:
+        yield manager
+    finally:
+        _active.manager = previous
+        manager.close()
+        logger.info("enum operations opened %d connection(s)", manager.opened)
 
 
-def is_enum_column_type(column_type):
+def net_enum_values(values, ops):
     """
-    Determines whether an column is a valid Enum type
+    Return the values an enum holding `values` ends up with once every
+    SyncEnumValuesOp of `ops` has run in turn: an op removing values leaves
+    exactly its `new_values`, any other op adds the values it adds.
     """
-    if isinstance(column_type, sqlalchemy.TypeDecorator):
-        column_type = column_type.impl
-
-    if isinstance(column_type, sqlalchemy.Enum):
-        return True
-    return False
+    for op in ops:
+        if op.should_reverse and op.affected_columns is not None:
+            values = frozenset(op.new_values)
+        else:
+            values = values | (frozenset(op.new_values) - frozenset(op.old_values))
+    return values
 
 
-def get_declared_enums(metadata, schema, default):
+class DeferredEnumSync:
     """
-    Return a dict mapping SQLAlchemy enumeration types to the set of their
-    declared values.
-    :param metadata:
-        ...
-    :param str schema:
-        Schema name (e.g. "public").
-    :returns DeclaredEnumValues:
-        enum_definitions: {
-            "my_enum": frozenset(["a", "b", "c"]),
-        },
-        table_definitions: [
-            EnumToTable(table_name="my_table", column_name="my_column", enum_name="my_enum"),
-        ]
+    op.sync_enum_values() calls queued by deferred_enum_sync(), by enum.
     """
-    types = set()
-    table_definitions = []
+    def __init__(self):
+        # (schema, name) -> SyncEnumValuesOps, in the order they were called
+        self.ops = {}
+        # Operations of the latest queued call, used to apply the queue
+        self.operations = None
+        self.queued = 0
+        self.applied = 0
 
-    for table in metadata.tables.values():
-        for column in table.columns:
-            if is_enum_column_type(column.type) and schema == (column.type.schema or default):
-                types.add(column.type)
-                table_definitions.append(
-                    EnumToTable(table.name, column.name, column.type.name)
+    def queue(self, operations, op):
+        self.operations = operations
+        self.ops.setdefault((op.schema, op.name), []).append(op)
+        self.queued += 1
+
+    def pending_values(self, schema, name, values):
+        """
+        Return the values enum `{schema}.{name}`, currently holding `values`,
+        will have once its queued operations are applied.
+        """
+        return net_enum_values(values, self.ops.get((schema, name), ()))
+
+    def flush(self, operations=None, enums=None):
+        """
+        Apply the queued operations of `enums`, (schema, name) pairs, or of
+        every enum, as one SyncEnumValuesOp per enum going from its current
+        values straight to the net result. Enums whose values end up
+        unchanged, or that no longer exist, are skipped.
+        """
+        if operations is None:
+            operations = self.operations
+        keys = [key for key in (self.ops if enums is None else enums) if key in self.ops]
+        if not keys:
+            return
+        with get_connection(operations) as conn:
+            defined_by_schema = get_defined_enums_by_schema(conn, sorted({schema for schema, _ in keys}))
+
+        previous = getattr(_active, "deferred", None)
+        _active.deferred = None
+        try:
+            for schema, name in keys:
+                ops = self.ops.pop((schema, name))
+                old_values = defined_by_schema[schema].enum_definitions.get(name)
+                if old_values is None:
+                    logger.info("enum %s.%s no longer exists, dropping %d queued sync(s)", schema, name, len(ops))
+                    continue
+                new_values = net_enum_values(old_values, ops)
+                if new_values == old_values:
+                    continue
+                removes = bool(old_values - new_values)
+                if removes:
+                    # The latest removal knows the columns to convert.
+                    template = [op for op in ops if op.should_reverse and op.affected_columns is not None][-1]
+                else:
+                    template = ops[-1]
+                options = get_non_default_options(template)
+                if not removes:
+                    # Nothing that could use the added values runs before
+                    # the migration commits.
+                    options["transactional"] = True
+                SyncEnumValuesOp.sync_enum_values(
+                    operations, schema, name, sorted(old_values), sorted(new_values), template.affected_columns,
+                    removes, **options,
                 )
+                self.applied += 1
+        finally:
+            _active.deferred = previous
 
-    return DeclaredEnumValues(
-        enum_definitions={
-            t.name: frozenset(t.enums) for t in types
-        },
-        table_definitions=table_definitions,
+
+@contextmanager
+def deferred_enum_sync():
+    """
+    Queue the op.sync_enum_values() calls made within the block, instead of
+    running them, and apply their net effect per enum when it exits, for
+    runs replaying many revisions such as building a fresh database. A value
+    added by one revision and removed by a later one is never added, and
+    successive removals rewrite the tables once. Meant to wrap
+    context.run_migrations() inside the migration transaction in env.py:
+
+        with context.begin_transaction():
+            with alembic_autogenerate_enums.deferred_enum_sync():
+                context.run_migrations()
+
+    Revisions must not depend on values added by earlier ones, e.g. by
+    inserting rows using them, since those are only added at the end.
+    op.rename_enum_value() first applies the queue of its enum. Nothing is
+    applied if the block raises. Yields the DeferredEnumSync, whose `queued`
+    and `applied` attributes count the calls queued and the operations run.
+    """
+    deferred = DeferredEnumSync()
+    previous = getattr(_active, "deferred", None)
+    _active.deferred = deferred
+    try:
+        yield deferred
+    finally:
+        _active.deferred = previous
+    deferred.flush()
+    logger.info(
+        "deferred enum sync applied %d operation(s) in place of %d queued", deferred.applied, deferred.queued,
     )
 
 
@@ -114,12 +2103,33 @@ def get_connection(operations) -> sqlalchemy.engine.Connection:
     SQLAlchemy 2.0 changes the operation binding location; bridge function to support
     both 1.x and 2.x.
 
+    When the bind is an Engine, the work runs in its own transaction on the
+    connection of the active managed_connections() block, or on a connection
+    opened and closed for this operation alone.
+
+    AsyncConnection and AsyncEngine binds (e.g. asyncpg) are used through
+    their sync facade, which is what AsyncConnection.run_sync() hands to an
+    async env.py; the operation must then run inside run_sync().
     """
     binding = operations.get_bind()
+    if AsyncConnection is not None and isinstance(binding, AsyncConnection):
+        binding = binding.sync_connection
+    elif AsyncEngine is not None and isinstance(binding, AsyncEngine):
+        binding = binding.sync_engine
+
     if isinstance(binding, sqlalchemy.engine.Connection):
         yield binding
         return
-    yield binding.connect()
+
+    manager = getattr(_active, "manager", None)
+    if manager is None:
+        with binding.begin() as conn:
+            yield conn
+        return
+
+    conn = manager.connect(binding)
+    with conn.begin():
+        yield conn
 
 
 @alembic.operations.base.Operations.register_operation("sync_enum_values")
@@ -131,7 +2141,23 @@ class SyncEnumValuesOp(alembic.operations.ops.MigrateOperation):
             old_values: List[str],
             new_values: List[str],
             affected_columns: List[Tuple[str, str]],
-            should_reverse: bool = False
+            should_reverse: bool = False,
+            strategy: str = REWRITE,
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            preflight: bool = True,
+            preflight_workers: int = 1,
+            transactional: bool = False,
+            lock_timeout=None,
+            lock_retries: int = 0,
+            lock_deadline: Optional[float] = None,
+            discover_columns: bool = True,
+            online_above_bytes: int = DEFAULT_ONLINE_ABOVE_BYTES,
+            refuse_above_bytes: Optional[int] = None,
+            concurrent_indexes: bool = False,
+            maintenance_work_mem=None,
+            by_partition: bool = False,
+            partition_workers: int = 1,
+            resumable: bool = False,
         ):
         self.schema = schema
         self.name = name
@@ -139,6 +2165,22 @@ class SyncEnumValuesOp(alembic.operations.ops.MigrateOperation):
         self.new_values = new_values
         self.affected_columns = affected_columns
         self.should_reverse = should_reverse
+        self.strategy = strategy
+        self.batch_size = batch_size
+        self.preflight = preflight
+        self.preflight_workers = preflight_workers
+        self.transactional = transactional
+        self.lock_timeout = lock_timeout
+        self.lock_retries = lock_retries
+        self.lock_deadline = lock_deadline
+        self.discover_columns = discover_columns
+        self.online_above_bytes = online_above_bytes
+        self.refuse_above_bytes = refuse_above_bytes
+        self.concurrent_indexes = concurrent_indexes
+        self.maintenance_work_mem = maintenance_work_mem
+        self.by_partition = by_partition
+        self.partition_workers = partition_workers
+        self.resumable = resumable
 
     def reverse(self):
         """
@@ -151,6 +2193,22 @@ class SyncEnumValuesOp(alembic.operations.ops.MigrateOperation):
             new_values=self.old_values,
             affected_columns=self.affected_columns,
             should_reverse=not self.should_reverse,
+            strategy=self.strategy,
+            batch_size=self.batch_size,
+            preflight=self.preflight,
+            preflight_workers=self.preflight_workers,
+            transactional=self.transactional,
+            lock_timeout=self.lock_timeout,
+            lock_retries=self.lock_retries,
+            lock_deadline=self.lock_deadline,
+            discover_columns=self.discover_columns,
+            online_above_bytes=self.online_above_bytes,
+            refuse_above_bytes=self.refuse_above_bytes,
+            concurrent_indexes=self.concurrent_indexes,
+            maintenance_work_mem=self.maintenance_work_mem,
+            by_partition=self.by_partition,
+            partition_workers=self.partition_workers,
+            resumable=self.resumable,
         )
 
     @classmethod
@@ -163,6 +2221,22 @@ class SyncEnumValuesOp(alembic.operations.ops.MigrateOperation):
         new_values: List[str],
         affected_columns: List[Tuple[str, str]] = None,
         should_reverse: bool = False,
+        strategy: str = REWRITE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        preflight: bool = True,
+        preflight_workers: int = 1,
+        transactional: bool = False,
+        lock_timeout=None,
+        lock_retries: int = 0,
+        lock_deadline: Optional[float] = None,
+        discover_columns: bool = True,
+        online_above_bytes: int = DEFAULT_ONLINE_ABOVE_BYTES,
+        refuse_above_bytes: Optional[int] = None,
+        concurrent_indexes: bool = False,
+        maintenance_work_mem=None,
+        by_partition: bool = False,
+        partition_workers: int = 1,
+        resumable: bool = False,
     ):
         """
         Define every enum value from `new_values` that is not present in
@@ -179,6 +2253,98 @@ class SyncEnumValuesOp(alembic.operations.ops.MigrateOperation):
         :param list new_values:
             List of enumeration values that should exist after this migration
             executes.
+        :param str strategy:
+            How affected columns are converted when values are removed.
+            "rewrite" (the default) rewrites each table with ALTER COLUMN TYPE
+            under an ACCESS EXCLUSIVE lock. "online" adds a shadow column of
+            the new type, backfills it in primary key batches of `batch_size`
+            rows with a trigger keeping it in sync, then swaps the columns in a
+            brief final lock. The online strategy commits as it goes, needs a
+            single-column primary key, and rebuilds plain indexes of the
+            converted columns concurrently after the swap. If it fails part
+            way, running the operation again finishes it from the journal
+            table, over the shadow columns left behind. "auto" uses
+            "online" for tables over `online_above_bytes`, counting indexes
+            and TOAST, and "rewrite" for the others.
+        :param int batch_size:
+            Rows per backfill transaction for the "online" strategy.
+        :param bool preflight:
+            Before removing values, check that no affected column still
+            stores one of them, and raise EnumValueInUseError instead of
+            failing part way through a table rewrite.
+        :param int preflight_workers:
+            Number of tables probed concurrently by the pre-flight check; see
+            check_values_unused().
+        :param bool transactional:
+            On PostgreSQL 12 and newer, add values inside the migration's
+            transaction instead of committing it first. Added values can't
+            be used until the migration commits. Older servers always take
+            the committing path.
+        :param lock_timeout:
+            lock_timeout applied to every statement, as milliseconds or a
+            PostgreSQL interval string such as "2s". Tables being rewritten
+            are then locked up front, in OID order and with NOWAIT, so the
+            operation never queues application queries behind it.
+        :param int lock_retries:
+            How many more times to try a step that failed to get its locks,
+            with jittered exponential backoff in between.
+        :param float lock_deadline:
+            Seconds after which no further attempt is made. When the retries
+            or the deadline run out, the step in progress is rolled back and
+            EnumLockTimeoutError is raised.
+        :param bool discover_columns:
+            When removing values, convert every column found to depend on the
+            type in the catalog (see get_enum_columns()), including arrays of
+            it and tables missing from `affected_columns`, rather than only
+            `affected_columns`. Columns that can't be converted, such as
+            columns of domains over the enum or of views, raise
+            SyncEnumValuesError before anything is changed.
+        :param int online_above_bytes:
+            Table size above which the "auto" strategy converts a table
+            online.
+        :param int refuse_above_bytes:
+            Raise EnumRewriteTooLargeError, before anything is changed, if a
+            table to convert is bigger than this. The plan is logged either
+            way; see plan_enum_rewrite().
+        :param bool concurrent_indexes:
+            For tables rewritten in place, drop the indexes using the
+            converted columns inside the lock, so the rewrite doesn't rebuild
+            them there, and recreate them with CREATE INDEX CONCURRENTLY once
+            the type swap has committed. The lock is then only held for the
+            heap rewrite, but queries run without those indexes until they
+            are rebuilt. Indexes backing constraints are still rebuilt under
+            the lock.
+        :param maintenance_work_mem:
+            maintenance_work_mem for concurrent index builds, e.g. "1GB".
+        :param bool by_partition:
+            For partitioned tables rewritten in place, detach the partitions
+            and convert the then empty parent within the type swap, then
+            convert each partition under its own lock and attach it back;
+            see convert_partitions(). Rows of a partition can't be reached
+            through the parent, nor inserted through it, until the partition
+            is attached again. Partitions that are themselves partitioned
+            raise SyncEnumValuesError before anything is changed. Detached
+            partitions are recorded in the journal table, and running the
+            operation again after a failure finishes them; see
+            resume_enum_conversion().
+        :param int partition_workers:
+            Number of partitions converted concurrently, on separate
+            connections, with `by_partition`.
+        :param bool resumable:
+            Convert each table in its own transaction, recording progress in
+            a journal table, instead of all of them in the migration's
+            transaction; see convert_tables_resumably(). If the operation
+            fails part way, `{name}_old` and the new type are left side by
+            side, and running it again only converts the columns still using
+            `{name}_old`.
+            Commits the migration's transaction first, and only supports
+            the "rewrite" strategy, without `concurrent_indexes` or
+            `by_partition`.
+
+        Removing values from an enum of more than ENUM_VALUES_PER_STATEMENT
+        values commits the migration's transaction first: the new type is
+        created and committed as `{name}_new` in chunks (see
+        create_enum_type()), then renamed in the swap.
 
         Note that `should_reverse` defaults to False here to keep backwards compatibility
         with previous migrations. The old interface to `sync_enum_values` supported explicit
@@ -192,36 +2358,239 @@ class SyncEnumValuesOp(alembic.operations.ops.MigrateOperation):
         executable by superusers).
 
         """
-        if should_reverse and affected_columns is not None:
-            with get_connection(operations) as conn:
-                all_values = ", ".join([
-                    f"'{value}'"
-                    for value in sorted(set(new_values))
-                ])
-
-                conn.execute(sqlalchemy.text(f"ALTER TYPE {schema}.{name} RENAME TO {name}_old"))
-                conn.execute(sqlalchemy.text(f"CREATE TYPE {schema}.{name} AS ENUM({all_values})"))
-                for table_name, column_name in affected_columns:
-                    conn.execute(sqlalchemy.text(
-                        f"ALTER TABLE {table_name} ALTER COLUMN {column_name} TYPE {schema}.{name} USING "
-                        f"{column_name}::text::{schema}.{name}"
-                    ))
-                conn.execute(sqlalchemy.text(f"DROP TYPE {schema}.{name}_old"))
-                return
+        if strategy not in STRATEGIES:
+            raise ValueError(f"unknown strategy {strategy!r}, expected one of {STRATEGIES}")
+        if resumable and (strategy != REWRITE or concurrent_indexes or by_partition):
+            raise ValueError("resumable only supports strategy='rewrite', without concurrent_indexes or by_partition")
 
-        with get_connection(operations) as conn:
-            conn.execute(sqlalchemy.text("COMMIT"))
-            for value in set(new_values) - set(old_values):
-                conn.execute(
-                    sqlalchemy.text(
-                        f"ALTER TYPE {schema}.{name} ADD VALUE '{value}'"
+        deferred = getattr(_active, "deferred", None)
+        if deferred is not None:
+            # Every argument but `operations` is a SyncEnumValuesOp argument.
+            arguments = locals()
+            deferred.queue(operations, cls(**{key: arguments[key] for key in inspect.signature(cls).parameters}))
+            return
+
+        policy = LockPolicy.create(lock_timeout, lock_retries, lock_deadline)
+        with operation_context(schema, name), get_connection(operations) as conn:
+            if should_reverse and affected_columns is not None:
+                all_values = sorted(set(new_values))
+
+                # A conversion that failed part way left the columns still
+                # to convert on {name}_old.
+                resuming = get_enum_values(conn, schema, f"{name}_old") is not None
+                if not resumable and (resuming or get_journal_entries(conn, schema, name)):
+                    resume_enum_conversion(
+                        conn, schema, name, all_values, policy, preflight=preflight,
+                        preflight_workers=preflight_workers, partition_workers=partition_workers,
+                        maintenance_work_mem=maintenance_work_mem, batch_size=batch_size,
                     )
+                    return
+                source = f"{name}_old" if resuming else name
+                if resuming:
+                    current_values = get_enum_values(conn, schema, name)
+                    if current_values != frozenset(all_values):
+                        raise SyncEnumValuesError(
+                            f"{schema}.{name}_old is left from an unfinished conversion to other values than "
+                            f"{all_values}: {sorted(current_values or ())}"
+                        )
+                    logger.info("resuming the conversion of %s.%s", schema, name)
+
+                # Whatever `affected_columns` says, the columns still using
+                # {name}_old are exactly those left to convert.
+                array_columns = set()
+                if discover_columns or resuming:
+                    affected_columns, array_columns = plan_enum_columns(conn, schema, source)
+
+                plan = plan_enum_rewrite(
+                    conn, schema, name, affected_columns, strategy, online_above_bytes, refuse_above_bytes
                 )
+                logger.info("enum conversion plan for %s", plan.format())
+                if plan.refused:
+                    raise EnumRewriteTooLargeError(plan)
+
+                if preflight:
+                    check_values_unused(
+                        conn, schema, source, affected_columns, set(old_values) - set(new_values),
+                        workers=preflight_workers, array_columns=array_columns,
+                    )
+
+                if resumable:
+                    convert_tables_resumably(
+                        conn, schema, name, all_values, affected_columns, array_columns, policy, resuming
+                    )
+                    return
+
+                rewrite_columns = [
+                    (table.cost.table_name, column_name)
+                    for table in plan.tables
+                    if table.strategy == REWRITE
+                    for column_name in table.column_names
+                ]
+                partitioned = {}
+                if by_partition or concurrent_indexes:
+                    partitioned = get_partitions(conn, group_columns_by_table(rewrite_columns))
+                nested = [
+                    partition.table_name
+                    for partitions in partitioned.values()
+                    for partition in partitions
+                    if partition.relkind == "p"
+                ]
+                if by_partition and nested:
+                    raise SyncEnumValuesError(
+                        f"cannot convert {', '.join(nested)} partition by partition: they are partitioned too"
+                    )
+
+                # Read before the type is renamed, so casts in index
+                # definitions resolve to the new type. Indexes of partitioned
+                # tables can't be built concurrently, and are left to the
+                # rewrite.
+                rewrite_indexes = []
+                if concurrent_indexes:
+                    for table_name, column_names in group_columns_by_table(rewrite_columns).items():
+                        if table_name in partitioned:
+                            continue
+                        rewrite_indexes.extend(
+                            (table_name, index_name, index_definition)
+                            for index_name, index_definition in get_column_indexes(conn, table_name, column_names)
+                        )
+                detach = partitioned if by_partition else {}
+
+                # Check every table converted online before touching
+                # anything, and read column defaults and indexes while they
+                # still refer to the current type name.
+                online_tables = [
+                    (
+                        table.cost.table_name,
+                        table.column_names,
+                        get_primary_key_column(conn, table.cost.table_name),
+                        get_column_dependents(conn, table.cost.table_name, table.column_names),
+                    )
+                    for table in plan.tables
+                    if table.strategy == ONLINE
+                ]
+
+                detached = any(detach.values())
+                rewrite_by_table = group_columns_by_table(rewrite_columns)
+
+                # A type too big for one statement is built and committed
+                # under a temporary name first, then renamed in the swap.
+                prebuilt = len(all_values) > ENUM_VALUES_PER_STATEMENT
+                if prebuilt:
+                    create_enum_type(conn, schema, f"{name}_new", all_values, policy, replace=True)
+
+                def replace_type():
+                    if policy is not None and rewrite_columns:
+                        lock_tables(conn, list(group_columns_by_table(rewrite_columns)) + [
+                            partition.table_name
+                            for partitions in detach.values()
+                            for partition in partitions
+                        ])
+                    execute_statement(conn, "rename_type", f"ALTER TYPE {schema}.{name} RENAME TO {name}_old")
+                    if prebuilt:
+                        execute_statement(conn, "rename_type", f"ALTER TYPE {schema}.{name}_new RENAME TO {name}")
+                    else:
+                        values_sql = ", ".join(enum_literal(value) for value in all_values)
+                        execute_statement(conn, "create_type", f"CREATE TYPE {schema}.{name} AS ENUM({values_sql})")
+                    # Dropped indexes are recorded, so that they can still be
+                    # rebuilt if the conversion fails before they are, and so
+                    # are the tables to convert online.
+                    if rewrite_indexes or online_tables or detached:
+                        create_journal(conn, schema)
+                    for table_name, column_names, primary_key, columns in online_tables:
+                        record_journal_entry(conn, schema, name, "online", table_name, dict(
+                            column_names=column_names,
+                            primary_key=primary_key,
+                            columns=columns,
+                            array_column_names=[
+                                column_name for column_name in column_names
+                                if (table_name, column_name) in array_columns
+                            ],
+                        ))
+                    for table_name, index_name, index_definition in rewrite_indexes:
+                        logger.info("dropping %s for the rewrite, to rebuild as: %s", index_name, index_definition)
+                        record_journal_entry(conn, schema, name, "index", index_name, dict(
+                            table_name=table_name, definition=index_definition,
+                        ))
+                        execute_statement(conn, "drop_index", f"DROP INDEX {index_name}", table_name=table_name)
+                    # Without partitions, altering the parent only changes
+                    # the catalog. Detached partitions are recorded, since
+                    # nothing else remembers them if the conversion fails.
+                    for table_name, partitions in detach.items():
+                        column_names = rewrite_by_table[table_name]
+                        for partition in partitions:
+                            record_journal_entry(conn, schema, name, "partition", partition.table_name, dict(
+                                table_name=table_name,
+                                relname=partition.relname,
+                                relkind=partition.relkind,
+                                bound=partition.bound,
+                                constraint=partition.constraint,
+                                column_names=column_names,
+                                array_column_names=[
+                                    column_name for column_name in column_names
+                                    if (table_name, column_name) in array_columns
+                                ],
+                            ))
+                            execute_statement(
+                                conn, "alter_table",
+                                f"ALTER TABLE {table_name} DETACH PARTITION {partition.table_name}",
+                                table_name=table_name,
+                            )
+                    rewrite_enum_columns(conn, schema, name, rewrite_columns, array_columns)
+                    if not online_tables and not detached:
+                        execute_statement(conn, "drop_type", f"DROP TYPE {schema}.{name}_old")
+
+                # create_enum_type() committed the migration's transaction.
+                try:
+                    run_with_lock_retries(
+                        conn, policy, replace_type, transaction="block" if prebuilt else "savepoint"
+                    )
+                except BaseException:
+                    if prebuilt:
+                        discard_enum_type(conn, schema, f"{name}_new")
+                    raise
+                if rewrite_indexes or online_tables or detached:
+                    execute_statement(conn, "transaction", "COMMIT")
+                rebuild_indexes_concurrently(conn, schema, name, rewrite_indexes, policy, maintenance_work_mem)
+                for table_name, partitions in detach.items():
+                    convert_partitions(
+                        conn, schema, name, table_name, rewrite_by_table[table_name], partitions,
+                        workers=partition_workers, policy=policy, array_columns=array_columns, journaled=True,
+                    )
+                if rewrite_indexes or online_tables or detached:
+                    for table_name, column_names, primary_key, columns in online_tables:
+                        online_convert_table(
+                            conn, schema, name, table_name, column_names, primary_key, columns, batch_size,
+                            policy=policy, array_columns=array_columns, maintenance_work_mem=maintenance_work_mem,
+                        )
+
+                    def finish():
+                        finish_journal(conn, schema, name)
+
+                    run_with_lock_retries(conn, policy, finish, transaction="block")
+                return
+
+            added = sorted(set(new_values) - set(old_values))
+            if transactional and conn.dialect.server_version_info >= TRANSACTIONAL_ADD_VALUE_VERSION:
+                if added:
+                    def add_values():
+                        add_enum_values(conn, schema, name, added)
+
+                    run_with_lock_retries(conn, policy, add_values)
+                return
+
+            execute_statement(conn, "transaction", "COMMIT")
+            for value in added:
+                def add_value():
+                    execute_statement(
+                        conn, "add_value", f"ALTER TYPE {schema}.{name} ADD VALUE {enum_literal(value)}"
+                    )
+
+                run_with_lock_retries(conn, policy, add_value, transaction="none")
 
 
 @alembic.autogenerate.render.renderers.dispatch_for(SyncEnumValuesOp)
 def render_sync_enum_value_op(autogen_context, op: SyncEnumValuesOp):
-    return "op.sync_enum_values(%r, %r, %r, %r, %r, %r)" % (
+    rendered = "op.sync_enum_values(%r, %r, %r, %r, %r, %r" % (
         op.schema,
         op.name,
         sorted(op.old_values),
@@ -229,6 +2598,547 @@ def render_sync_enum_value_op(autogen_context, op: SyncEnumValuesOp):
         op.affected_columns,
         op.should_reverse,
     )
+    if op.strategy != REWRITE:
+        rendered += ", strategy=%r, batch_size=%r" % (op.strategy, op.batch_size)
+    if op.online_above_bytes != DEFAULT_ONLINE_ABOVE_BYTES:
+        rendered += ", online_above_bytes=%r" % (op.online_above_bytes,)
+    if op.refuse_above_bytes is not None:
+        rendered += ", refuse_above_bytes=%r" % (op.refuse_above_bytes,)
+    if not op.preflight:
+        rendered += ", preflight=False"
+    if op.preflight_workers != 1:
+        rendered += ", preflight_workers=%r" % (op.preflight_workers,)
+    if op.transactional:
+        rendered += ", transactional=True"
+    if op.lock_timeout is not None:
+        rendered += ", lock_timeout=%r" % (op.lock_timeout,)
+    if op.lock_retries:
+        rendered += ", lock_retries=%r" % (op.lock_retries,)
+    if op.lock_deadline is not None:
+        rendered += ", lock_deadline=%r" % (op.lock_deadline,)
+    if not op.discover_columns:
+        rendered += ", discover_columns=False"
+    if op.concurrent_indexes:
+        rendered += ", concurrent_indexes=True"
+    if op.maintenance_work_mem is not None:
+        rendered += ", maintenance_work_mem=%r" % (op.maintenance_work_mem,)
+    if op.by_partition:
+        rendered += ", by_partition=True"
+    if op.partition_workers != 1:
+        rendered += ", partition_workers=%r" % (op.partition_workers,)
+    if op.resumable:
+        rendered += ", resumable=True"
+    return rendered + ")"
+
+
+@alembic.operations.base.Operations.register_operation("rename_enum_value")
+class RenameEnumValueOp(alembic.operations.ops.MigrateOperation):
+    def __init__(self, schema: str, name: str, old_value: str, new_value: str):
+        self.schema = schema
+        self.name = name
+        self.old_value = old_value
+        self.new_value = new_value
+
+    def reverse(self):
+        """
+        See MigrateOperation.reverse().
+        """
+        return RenameEnumValueOp(self.schema, self.name, old_value=self.new_value, new_value=self.old_value)
+
+    @classmethod
+    def rename_enum_value(cls, operations, schema, name, old_value: str, new_value: str):
+        """
+        Rename value `old_value` of enum `{schema}.{name}` to `new_value`.
+        Only the catalog changes: rows storing the value read back the new
+        name, and no table is rewritten or locked. Needs PostgreSQL 10 or
+        newer, and runs inside the migration's transaction.
+        """
+        deferred = getattr(_active, "deferred", None)
+        if deferred is not None:
+            deferred.flush(operations, [(schema, name)])
+        with operation_context(schema, name), get_connection(operations) as conn:
+            if conn.dialect.server_version_info < RENAME_VALUE_VERSION:
+                raise SyncEnumValuesError(
+                    f"renaming value {old_value!r} of {schema}.{name} needs PostgreSQL 10 or newer"
+                )
+            execute_statement(
+                conn,
+                "rename_value",
+                f"ALTER TYPE {schema}.{name} RENAME VALUE {enum_literal(old_value)} TO {enum_literal(new_value)}",
+            )
+
+
+@alembic.autogenerate.render.renderers.dispatch_for(RenameEnumValueOp)
+def render_rename_enum_value_op(autogen_context, op: RenameEnumValueOp):
+    return "op.rename_enum_value(%r, %r, %r, %r)" % (op.schema, op.name, op.old_value, op.new_value)
+
+
+def render_enum_op(op):
+    """
+    Render any operation of this module as its op.*() call.
+    """
+    return alembic.autogenerate.render.renderers.dispatch(op)(None, op)
+
+
+@alembic.operations.base.Operations.register_operation("sync_enum_values_across_schemas")
+class SyncEnumValuesAcrossSchemasOp(alembic.operations.ops.MigrateOperation):
+    """
+    The same change to enum `name` in each of many schemas, as in
+    schema-per-tenant deployments: one operation, rendered once, standing in
+    for a SyncEnumValuesOp per schema.
+    """
+    def __init__(
+            self,
+            name: str,
+            schemas: List[str],
+            added_values: List[str],
+            removed_values: List[str],
+            affected_columns: List[Tuple[str, str]],
+            should_reverse: bool = False,
+            **options,
+        ):
+        self.name = name
+        self.schemas = schemas
+        self.added_values = added_values
+        self.removed_values = removed_values
+        self.affected_columns = affected_columns
+        self.should_reverse = should_reverse
+        self.options = options
+
+    def reverse(self):
+        """
+        See MigrateOperation.reverse().
+        """
+        return SyncEnumValuesAcrossSchemasOp(
+            self.name,
+            self.schemas,
+            added_values=self.removed_values,
+            removed_values=self.added_values,
+            affected_columns=self.affected_columns,
+            should_reverse=not self.should_reverse,
+            **self.options,
+        )
+
+    @classmethod
+    def sync_enum_values_across_schemas(
+        cls,
+        operations,
+        name,
+        schemas: List[str],
+        added_values: List[str],
+        removed_values: List[str],
+        affected_columns: List[Tuple[str, str]] = None,
+        should_reverse: bool = False,
+        **options,
+    ):
+        """
+        Apply op.sync_enum_values() to enum `name` in every schema of
+        `schemas`, with the new values of each schema being its current
+        values plus `added_values`, minus `removed_values`.
+        The current values of every schema are read in one query. Schemas
+        where the enum doesn't exist or already has the resulting values are
+        skipped, and schemas starting from the same values share one set of
+        new values.
+        :param options:
+            Extra op.sync_enum_values() arguments, e.g. strategy="online".
+        """
+        added = frozenset(added_values)
+        removed = frozenset(removed_values)
+        with get_connection(operations) as conn:
+            defined_by_schema = get_defined_enums_by_schema(conn, schemas)
+
+        deferred = getattr(_active, "deferred", None)
+        new_values_by_old = {}
+        skipped = 0
+        for schema in schemas:
+            old_values = defined_by_schema[schema].enum_definitions.get(name)
+            if old_values is None:
+                skipped += 1
+                continue
+            if deferred is not None:
+                old_values = deferred.pending_values(schema, name, old_values)
+            new_values = new_values_by_old.get(old_values)
+            if new_values is None:
+                new_values = new_values_by_old[old_values] = (old_values | added) - removed
+            # Going forward only values are added, so removed values don't
+            # make a schema out of date.
+            if (new_values == old_values) if should_reverse else (added <= old_values):
+                skipped += 1
+                continue
+            SyncEnumValuesOp.sync_enum_values(
+                operations, schema, name, sorted(old_values), sorted(new_values), affected_columns, should_reverse,
+                **options,
+            )
+        logger.info("enum %s: %d of %d schemas already up to date", name, skipped, len(schemas))
+
+
+@alembic.autogenerate.render.renderers.dispatch_for(SyncEnumValuesAcrossSchemasOp)
+def render_sync_enum_values_across_schemas_op(autogen_context, op: SyncEnumValuesAcrossSchemasOp):
+    rendered = "op.sync_enum_values_across_schemas(%r, %r, %r, %r, %r, %r" % (
+        op.name,
+        op.schemas,
+        sorted(op.added_values),
+        sorted(op.removed_values),
+        op.affected_columns,
+        op.should_reverse,
+    )
+    for key, value in sorted(op.options.items()):
+        rendered += ", %s=%r" % (key, value)
+    return rendered + ")"
+
+
+def get_non_default_options(op):
+    """
+    Return the arguments of SyncEnumValuesOp `op` that differ from their
+    defaults, apart from `should_reverse`, as keyword arguments for the ops
+    standing in for it.
+    """
+    defaults = {
+        name: parameter.default
+        for name, parameter in inspect.signature(SyncEnumValuesOp).parameters.items()
+        if parameter.default is not parameter.empty
+    }
+    return {
+        key: value
+        for key, value in vars(op).items()
+        if key in defaults and key != "should_reverse" and value != defaults[key]
+    }
+
+
+def fan_out_sync_enum_values_ops(ops, min_schemas=2):
+    """
+    Replace SyncEnumValuesOps making the same change to the same enum name in
+    at least `min_schemas` schemas by one SyncEnumValuesAcrossSchemasOp.
+    :param list ops:
+        get_sync_enum_values_ops() result.
+    :returns list:
+        `ops`, with each group replaced by a SyncEnumValuesAcrossSchemasOp at
+        the position of its first member. Other operations are kept as they
+        are, in their original order.
+    """
+    groups = {}
+    for op in ops:
+        if not isinstance(op, SyncEnumValuesOp):
+            continue
+        old_values = frozenset(op.old_values)
+        new_values = frozenset(op.new_values)
+        key = (
+            op.name,
+            new_values - old_values,
+            old_values - new_values,
+            tuple(sorted(op.affected_columns)),
+            op.should_reverse,
+        )
+        groups.setdefault(key, []).append(op)
+
+    # id() of the first op of each group -> the op replacing the group
+    fanned_out = {}
+    grouped = set()
+    for (name, added, removed, affected_columns, should_reverse), group in groups.items():
+        if len(group) < min_schemas:
+            continue
+        # The ops of a group share their options.
+        options = get_non_default_options(group[0])
+        fanned_out[id(group[0])] = SyncEnumValuesAcrossSchemasOp(
+            name,
+            [op.schema for op in group],
+            sorted(added),
+            sorted(removed),
+            list(affected_columns),
+            should_reverse,
+            **options,
+        )
+        grouped.update(id(op) for op in group)
+
+    return [
+        fanned_out.get(id(op), op)
+        for op in ops
+        if id(op) not in grouped or id(op) in fanned_out
+    ]
+
+
+@alembic.operations.base.Operations.register_operation("sync_enum_values_delta")
+class SyncEnumValuesDeltaOp(alembic.operations.ops.MigrateOperation):
+    """
+    A SyncEnumValuesOp recorded as the values it adds and removes, with
+    hashes of the values before and after instead of the complete lists, for
+    enums too big to render in full.
+    """
+    def __init__(
+            self,
+            schema: str,
+            name: str,
+            added_values: List[str],
+            removed_values: List[str],
+            old_values_hash: str,
+            new_values_hash: str,
+            affected_columns: List[Tuple[str, str]],
+            should_reverse: bool = False,
+            **options,
+        ):
+        self.schema = schema
+        self.name = name
+        self.added_values = added_values
+        self.removed_values = removed_values
+        self.old_values_hash = old_values_hash
+        self.new_values_hash = new_values_hash
+        self.affected_columns = affected_columns
+        self.should_reverse = should_reverse
+        self.options = options
+
+    def reverse(self):
+        """
+        See MigrateOperation.reverse().
+        """
+        return SyncEnumValuesDeltaOp(
+            self.schema,
+            self.name,
+            added_values=self.removed_values,
+            removed_values=self.added_values,
+            old_values_hash=self.new_values_hash,
+            new_values_hash=self.old_values_hash,
+            affected_columns=self.affected_columns,
+            should_reverse=not self.should_reverse,
+            **self.options,
+        )
+
+    @classmethod
+    def sync_enum_values_delta(
+        cls,
+        operations,
+        schema,
+        name,
+        added_values: List[str],
+        removed_values: List[str],
+        old_values_hash: str,
+        new_values_hash: str,
+        affected_columns: List[Tuple[str, str]] = None,
+        should_reverse: bool = False,
+        **options,
+    ):
+        """
+        Apply op.sync_enum_values() to enum `{schema}.{name}`, with the old
+        values read from the database and the new values being those plus
+        `added_values`, minus `removed_values` (only when `should_reverse`,
+        as for op.sync_enum_values()).
+        :param str old_values_hash:
+            enum_values_hash() of the values the migration expects to find.
+        :param str new_values_hash:
+            enum_values_hash() of the values the operation leaves. An enum
+            that already has them is left alone.
+        :param options:
+            Extra op.sync_enum_values() arguments, e.g. strategy="online".
+        :raises EnumValuesMismatchError:
+            If the enum has neither the expected old values nor the new ones.
+        """
+        with get_connection(operations) as conn:
+            old_values = get_enum_values(conn, schema, name)
+        if old_values is None:
+            raise SyncEnumValuesError(f"enum {schema}.{name} does not exist")
+        deferred = getattr(_active, "deferred", None)
+        if deferred is not None:
+            old_values = deferred.pending_values(schema, name, old_values)
+
+        values_hash = enum_values_hash(old_values)
+        if values_hash == new_values_hash:
+            logger.info("enum %s.%s already has the values of this migration", schema, name)
+            return
+        if values_hash != old_values_hash:
+            raise EnumValuesMismatchError(schema, name, old_values_hash, old_values)
+
+        new_values = old_values | frozenset(added_values)
+        if should_reverse:
+            new_values -= frozenset(removed_values)
+        SyncEnumValuesOp.sync_enum_values(
+            operations, schema, name, sorted(old_values), sorted(new_values), affected_columns, should_reverse,
+            **options,
+        )
+
+
+@alembic.autogenerate.render.renderers.dispatch_for(SyncEnumValuesDeltaOp)
+def render_sync_enum_values_delta_op(autogen_context, op: SyncEnumValuesDeltaOp):
+    rendered = "op.sync_enum_values_delta(%r, %r, %r, %r, %r, %r, %r, %r" % (
+        op.schema,
+        op.name,
+        sorted(op.added_values),
+        sorted(op.removed_values),
+        op.old_values_hash,
+        op.new_values_hash,
+        op.affected_columns,
+        op.should_reverse,
+    )
+    for key, value in sorted(op.options.items()):
+        rendered += ", %s=%r" % (key, value)
+    return rendered + ")"
+
+
+def delta_sync_enum_values_ops(ops, min_values):
+    """
+    Replace every SyncEnumValuesOp of an enum with at least `min_values`
+    values, before or after the change, by a SyncEnumValuesDeltaOp.
+    :returns list:
+        `ops`, in the same order.
+    """
+    delta_ops = []
+    for op in ops:
+        if not isinstance(op, SyncEnumValuesOp):
+            delta_ops.append(op)
+            continue
+        old_values = frozenset(op.old_values)
+        new_values = frozenset(op.new_values)
+        if max(len(old_values), len(new_values)) < min_values:
+            delta_ops.append(op)
+            continue
+        # Without should_reverse, values are only ever added.
+        result = new_values if op.should_reverse else old_values | new_values
+        delta_ops.append(SyncEnumValuesDeltaOp(
+            op.schema,
+            op.name,
+            sorted(new_values - old_values),
+            sorted(old_values - new_values),
+            enum_values_hash(old_values),
+            enum_values_hash(result),
+            op.affected_columns,
+            op.should_reverse,
+            **get_non_default_options(op),
+        ))
+    return delta_ops
+
+
+def find_enum_value_renames(old_values, new_values, hints=None, heuristic=False):
+    """
+    Work out which values removed between `old_values` and `new_values` were
+    really renamed.
+    :param dict hints:
+        Mapping of old value to new value, applied when the old value is
+        being removed and the new one added.
+    :param bool heuristic:
+        Also treat a single remaining removed value and a single remaining
+        added value as a rename.
+    :returns dict:
+        Mapping of old value to new value.
+    """
+    removed = set(old_values) - set(new_values)
+    added = set(new_values) - set(old_values)
+    renames = {}
+    for old_value, new_value in sorted((hints or {}).items()):
+        if old_value in removed and new_value in added:
+            renames[old_value] = new_value
+            removed.discard(old_value)
+            added.discard(new_value)
+    if heuristic and len(removed) == 1 and len(added) == 1:
+        renames[removed.pop()] = added.pop()
+    return renames
+
+
+def diff_enums(declared_by_schema, defined_by_schema, schemas):
+    """
+    Diff declared enums against defined ones.
+    Enums that aren't defined yet are skipped, since SQLAlchemy/Alembic will
+    create them as part of the usual migration process.
+    :returns list:
+        (schema, name, old values, new values, DeclaredEnumValues) for every
+        enum whose values differ, sorted by schema and name.
+    """
+    changes = []
+    for schema in schemas:
+        defined = defined_by_schema[schema]
+        declared = declared_by_schema.get(schema)
+        if declared is None:
+            continue
+        for name, new_values in declared.enum_definitions.items():
+            old_values = defined.enum_definitions.get(name)
+            # Alembic will handle creation of the type in this migration, so
+            # skip undefined names.
+            if name in defined.enum_definitions and new_values != old_values:
+                changes.append((schema, name, old_values, new_values, declared))
+    changes.sort(key=lambda change: change[:2])
+    return changes
+
+
+def build_sync_enum_values_ops(changes, detect_renames=False, **options):
+    """
+    Turn diff_enums() `changes` into the operations bringing each enum in
+    line: a RenameEnumValueOp per renamed value, then a SyncEnumValuesOp for
+    any remaining difference.
+    """
+    ops = []
+    for schema, name, old_values, new_values, declared in changes:
+        renames = find_enum_value_renames(
+            old_values, new_values, (declared.renames_by_enum or {}).get(name), detect_renames
+        )
+        for old_value, new_value in sorted(renames.items()):
+            ops.append(RenameEnumValueOp(schema, name, old_value, new_value))
+        old_values = frozenset(renames.get(value, value) for value in old_values)
+        if old_values != new_values:
+            affected_columns = sorted(set(declared.columns_by_enum[name]))
+            ops.append(SyncEnumValuesOp(schema, name, list(old_values), list(new_values), affected_columns, **options))
+    return ops
+
+
+def get_sync_enum_values_ops(declared_by_schema, defined_by_schema, schemas, detect_renames=False, **options):
+    """
+    Diff declared enums against defined ones and return the operations
+    bringing every enum whose values differ in line: a RenameEnumValueOp per
+    renamed value, then a SyncEnumValuesOp for any remaining difference.
+    Enums that aren't defined yet are skipped, since SQLAlchemy/Alembic will
+    create them as part of the usual migration process.
+    :param dict declared_by_schema:
+        get_declared_enums_by_schema() result.
+    :param dict defined_by_schema:
+        get_defined_enums_by_schema() result, or that of another defined enum
+        source.
+    :param list schemas:
+        Schema names to compare.
+    :param bool detect_renames:
+        Besides renames hinted by the declared columns, treat one value
+        removed and one added as a rename; see find_enum_value_renames().
+    :param options:
+        Extra SyncEnumValuesOp arguments, e.g. strategy="online".
+    :returns list:
+        Operations, sorted by schema and name.
+    """
+    changes = diff_enums(declared_by_schema, defined_by_schema, schemas)
+    return build_sync_enum_values_ops(changes, detect_renames, **options)
+
+
+@dataclass
+class ComparatorProfile:
+    """
+    Where compare_enums() spent its time, reported when profiling is enabled
+    with context.configure(enum_comparator_profiler=...).
+    """
+    # Seconds spent per phase: "introspection" (reading defined enums),
+    # "metadata" (walking the MetaData), "diff" and "ops" (building
+    # operations, including the schema fan-out)
+    phases: Dict[str, float]
+    schemas: int
+    declared_enums: int
+    defined_enums: int
+    columns: int
+    changed_enums: int
+    ops: int
+
+    @property
+    def total(self):
+        return sum(self.phases.values())
+
+
+def report_comparator_profile(profiler, profile):
+    """
+    Hand `profile` to `profiler`, or log it at INFO level, with its fields
+    under the "enum_comparator_profile" extra, when `profiler` is True.
+    """
+    if profiler is True:
+        logger.info(
+            "compare_enums took %.3fs (%s) for %d schemas, %d declared enums, %d columns: %d ops",
+            profile.total,
+            ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in profile.phases.items()),
+            profile.schemas, profile.declared_enums, profile.columns, profile.ops,
+            extra={"enum_comparator_profile": asdict(profile)},
+        )
+    else:
+        profiler(profile)
 
 
 @alembic.autogenerate.comparators.dispatch_for("schema")
@@ -240,27 +3150,80 @@ def compare_enums(autogen_context, upgrade_ops, schema_names):
     declared version.
     Enums that don't exist in the database yet are ignored, since
     SQLAlchemy/Alembic will create them as part of the usual migration process.
+
+    Defined enums are read from the live connection unless env.py passes
+    another source to context.configure() as `defined_enums_source` (any
+    object with a get_defined_enums_by_schema(conn, schemas) method, such as
+    an EnumSnapshot) or `enum_catalog_cache` (an EnumCatalogCache).
+
+    Renamed values are emitted as RenameEnumValueOps when hinted by the
+    declared columns, or when `enum_rename_heuristic` is set; see
+    get_sync_enum_values_ops().
+
+    `enum_fan_out_min_schemas` and `enum_delta_min_values` render changes
+    more compactly; see fan_out_sync_enum_values_ops() and
+    delta_sync_enum_values_ops().
+
+    Setting `enum_comparator_profiler` times each phase of the comparison;
+    see ComparatorProfile.
     """
-    to_add = set()
-    for schema in schema_names:
-        default = autogen_context.dialect.default_schema_name
-        if schema is None:
-            schema = default
+    default = autogen_context.dialect.default_schema_name
+    schemas = [
+        default if schema is None else schema
+        for schema in schema_names
+    ]
+    started = time.perf_counter()
+    source = (
+        autogen_context.opts.get("defined_enums_source")
+        or autogen_context.opts.get("enum_catalog_cache")
+    )
+    if source is not None:
+        defined_by_schema = source.get_defined_enums_by_schema(autogen_context.connection, schemas)
+    else:
+        defined_by_schema = get_defined_enums_by_schema(autogen_context.connection, schemas)
+    introspected = time.perf_counter()
 
-        defined = get_defined_enums(autogen_context.connection, schema)
-        declared = get_declared_enums(autogen_context.metadata, schema, default)
-        for name, new_values in declared.enum_definitions.items():
-            old_values = defined.enum_definitions.get(name)
-            # Alembic will handle creation of the type in this migration, so
-            # skip undefined names.
-            if name in defined.enum_definitions and new_values != old_values:
-                affected_columns = frozenset(
-                    (table_definition.table_name, table_definition.column_name)
-                    for table_definition in declared.table_definitions
-                    if table_definition.enum_name == name
-                )
-                to_add.add((schema, name, old_values, new_values, affected_columns))
+    declared_by_schema = get_declared_enums_by_schema(autogen_context.metadata, default)
+    walked = time.perf_counter()
+
+    changes = diff_enums(declared_by_schema, defined_by_schema, schemas)
+    diffed = time.perf_counter()
+
+    # Extra SyncEnumValuesOp arguments, e.g. {"strategy": "online"}, passed as
+    # context.configure(sync_enum_values_options=...) in env.py.
+    options = autogen_context.opts.get("sync_enum_values_options") or {}
+    ops = build_sync_enum_values_ops(
+        changes, detect_renames=autogen_context.opts.get("enum_rename_heuristic", False), **options
+    )
+
+    # With context.configure(enum_fan_out_min_schemas=N), an enum changed the
+    # same way in N or more schemas gets a single
+    # op.sync_enum_values_across_schemas() call.
+    min_schemas = autogen_context.opts.get("enum_fan_out_min_schemas")
+    if min_schemas:
+        ops = fan_out_sync_enum_values_ops(ops, min_schemas)
+    # With context.configure(enum_delta_min_values=N), changes to enums of N
+    # or more values render as op.sync_enum_values_delta() calls.
+    min_values = autogen_context.opts.get("enum_delta_min_values")
+    if min_values:
+        ops = delta_sync_enum_values_ops(ops, min_values)
+    upgrade_ops.ops.extend(ops)
 
-    for schema, name, old_values, new_values, affected_columns in sorted(to_add):
-        op = SyncEnumValuesOp(schema, name, list(old_values), list(new_values), list(affected_columns))
-        upgrade_ops.ops.append(op)
+    # context.configure(enum_comparator_profiler=...): a callable receiving a
+    # ComparatorProfile, or True to log it.
+    profiler = autogen_context.opts.get("enum_comparator_profiler")
+    if profiler:
+        report_comparator_profile(profiler, ComparatorProfile(
+            phases={
+                "introspection": introspected - started,
+                "metadata": walked - introspected,
+                "diff": diffed - walked,
+                "ops": time.perf_counter() - diffed,
+            },
+            schemas=len(schemas),
+            declared_enums=sum(len(declared.enum_definitions) for declared in declared_by_schema.values()),
+            defined_enums=sum(len(defined.enum_definitions) for defined in defined_by_schema.values()),
+            columns=sum(len(declared.table_definitions or ()) for declared in declared_by_schema.values()),
+            changed_enums=len(changes),
+            ops=len(ops),
+        ))
@@ -0,0 +1,134 @@
+"""
+On-disk cache of introspected enum definitions, for repeated autogenerate
+runs against an unchanged database.
+
+Usage, in ``env.py``:
+
+    from alembic_autogenerate_enums.cache import EnumCatalogCache
+
+    context.configure(
+        ...,
+        enum_catalog_cache=EnumCatalogCache(".alembic_enum_cache.json"),
+    )
+
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+import sqlalchemy
+
+from alembic_autogenerate_enums import (DeclaredEnumValues,
+                                        get_defined_enums_by_schema)
+
+
+def get_catalog_state(conn):
+    """
+    Return a string identifying the database `conn` is connected to, and a
+    marker that changes whenever a schema, enum type or enum label in it is
+    created, altered or dropped, in one round trip.
+    The identity starts with the cluster's system identifier: over a Unix
+    socket the server address and port are NULL, and database OIDs repeat
+    from one cluster to the next.
+    The marker is the number of those catalog rows plus the newest xmin among
+    them. It covers the whole database rather than the schemas compared:
+    filtering by schema needs joins that cost nearly as much as reading the
+    enums themselves, while a change elsewhere only costs a cache miss.
+    :returns tuple:
+        (identity, marker)
+    """
+    sql = """
+        SELECT
+            (SELECT system_identifier FROM pg_catalog.pg_control_system()),
+            inet_server_addr()::text,
+            inet_server_port(),
+            current_database(),
+            (SELECT oid FROM pg_catalog.pg_database WHERE datname = current_database()),
+            (SELECT count(*) FROM pg_catalog.pg_namespace),
+            (SELECT count(*) FROM pg_catalog.pg_type WHERE typtype = 'e'),
+            (SELECT count(*) FROM pg_catalog.pg_enum),
+            GREATEST(
+                (SELECT max(xmin::text::bigint) FROM pg_catalog.pg_namespace),
+                (SELECT max(xmin::text::bigint) FROM pg_catalog.pg_type WHERE typtype = 'e'),
+                (SELECT max(xmin::text::bigint) FROM pg_catalog.pg_enum)
+            )
+    """
+    system_identifier, address, port, database, oid, *marker = conn.execute(sqlalchemy.text(sql)).first()
+    return f"{system_identifier}@{address or 'local'}:{port or ''}/{database}#{oid}", list(marker)
+
+
+class EnumCatalogCache:
+    """
+    Serve get_defined_enums_by_schema() results from a JSON file, keyed by
+    database identity and the schemas requested. A cached entry is used as
+    long as the marker from get_catalog_state() is unchanged, otherwise the
+    catalog is read again and the file rewritten.
+    :param str path:
+        Cache file location; created on first use.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+    def get_defined_enums_by_schema(self, conn, schemas):
+        """
+        Cached version of alembic_autogenerate_enums.get_defined_enums_by_schema().
+        """
+        schemas = sorted(set(schemas))
+        identity, marker = get_catalog_state(conn)
+        key = hashlib.sha1("\n".join([identity] + schemas).encode()).hexdigest()
+
+        entries = self.load()
+        entry = entries.get(key)
+        if entry is not None and entry["marker"] == marker:
+            self.hits += 1
+            return {
+                schema: DeclaredEnumValues({
+                    name: frozenset(values)
+                    for name, values in entry["enums"].get(schema, {}).items()
+                })
+                for schema in schemas
+            }
+
+        self.misses += 1
+        by_schema = get_defined_enums_by_schema(conn, schemas)
+        entries[key] = {
+            "marker": marker,
+            "enums": {
+                schema: {
+                    name: sorted(values)
+                    for name, values in defined.enum_definitions.items()
+                }
+                for schema, defined in by_schema.items()
+            },
+        }
+        self.save(entries)
+        return by_schema
+
+    def load(self):
+        """
+        Return every cached entry, or an empty dict if the file is missing or
+        unreadable.
+        """
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, entries):
+        """
+        Atomically replace the cache file with `entries`.
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entries, f, sort_keys=True)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
@@ -0,0 +1,143 @@
+"""
+Quick check of the enums declared by a MetaData against a live database,
+without the table reflection an autogenerate run does. Every schema is read
+with one catalog query, so it's cheap enough for service startup or a
+readiness probe:
+
+    from alembic_autogenerate_enums.drift import assert_no_enum_drift
+
+    with engine.connect() as conn:
+        assert_no_enum_drift(conn, Base.metadata)
+
+The module is also a command line tool, exiting with status 1 on drift:
+
+    python -m alembic_autogenerate_enums.drift myapp.models:Base.metadata --url URL
+
+"""
+
+import argparse
+import json
+import sys
+from dataclasses import asdict, dataclass
+from typing import List
+
+import sqlalchemy
+
+from alembic_autogenerate_enums import (get_declared_enums_by_schema,
+                                        get_defined_enums_by_schema)
+from alembic_autogenerate_enums.snapshot import import_object
+
+
+@dataclass
+class EnumDrift:
+    """
+    Difference between a declared enum and the database.
+    """
+    schema: str
+    name: str
+    # The type doesn't exist in the database at all
+    missing_type: bool
+    # Declared values the database lacks, i.e. the database is behind
+    missing_values: List[str]
+    # Database values that aren't declared, i.e. the database is ahead
+    extra_values: List[str]
+
+    @property
+    def is_behind(self):
+        return self.missing_type or bool(self.missing_values)
+
+    def __str__(self):
+        if self.missing_type:
+            return f"{self.schema}.{self.name}: type missing"
+        parts = []
+        if self.missing_values:
+            parts.append(f"missing {', '.join(self.missing_values)}")
+        if self.extra_values:
+            parts.append(f"extra {', '.join(self.extra_values)}")
+        return f"{self.schema}.{self.name}: {'; '.join(parts)}"
+
+
+class EnumDriftError(Exception):
+    """
+    Raised by assert_no_enum_drift(); `drift` lists the offending enums.
+    """
+    def __init__(self, drift):
+        super().__init__("database enums differ from the declared ones:\n" + "\n".join(map(str, drift)))
+        self.drift = drift
+
+
+def check_enum_drift(conn, metadata, schemas=None, default=None):
+    """
+    Compare the enums declared by `metadata` with those defined in the
+    database.
+    :param list schemas:
+        Schema names to check; defaults to every schema declaring an enum.
+    :param str default:
+        Schema of enums that don't declare one; defaults to the connection's
+        default schema.
+    :returns list:
+        EnumDrift for every enum that differs, sorted by schema and name.
+    """
+    if default is None:
+        default = conn.dialect.default_schema_name or "public"
+    declared_by_schema = get_declared_enums_by_schema(metadata, default)
+    if schemas is None:
+        schemas = sorted(declared_by_schema)
+    defined_by_schema = get_defined_enums_by_schema(conn, schemas)
+
+    drift = []
+    for schema in schemas:
+        declared = declared_by_schema.get(schema)
+        if declared is None:
+            continue
+        defined = defined_by_schema[schema].enum_definitions
+        for name, values in sorted(declared.enum_definitions.items()):
+            if name not in defined:
+                drift.append(EnumDrift(schema, name, True, sorted(values), []))
+            elif values != defined[name]:
+                drift.append(EnumDrift(
+                    schema, name, False, sorted(values - defined[name]), sorted(defined[name] - values)
+                ))
+    return drift
+
+
+def assert_no_enum_drift(conn, metadata, schemas=None, default=None, strict=False):
+    """
+    Raise EnumDriftError if the database lacks a declared enum or value.
+    :param bool strict:
+        Also fail on values only the database has, which is normally fine:
+        it happens while a migration adding values is rolled out ahead of the
+        code using them.
+    """
+    drift = [
+        item
+        for item in check_enum_drift(conn, metadata, schemas, default)
+        if strict or item.is_behind
+    ]
+    if drift:
+        raise EnumDriftError(drift)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m alembic_autogenerate_enums.drift")
+    parser.add_argument("metadata", help="package.module:metadata")
+    parser.add_argument("--url", required=True, help="SQLAlchemy database URL")
+    parser.add_argument("--schema", action="append", help="schema to check; repeatable")
+    parser.add_argument("--default-schema")
+    parser.add_argument("--strict", action="store_true", help="also fail on values only the database has")
+    parser.add_argument("--json", action="store_true", help="print the drift as JSON")
+    args = parser.parse_args(argv)
+
+    engine = sqlalchemy.create_engine(args.url, poolclass=sqlalchemy.pool.NullPool)
+    with engine.connect() as conn:
+        drift = check_enum_drift(conn, import_object(args.metadata), args.schema, args.default_schema)
+    if args.json:
+        print(json.dumps([asdict(item) for item in drift], indent=2))
+    else:
+        for item in drift:
+            print(item)
+    return 1 if any(args.strict or item.is_behind for item in drift) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""
+Apply pending enum changes to many databases sharing one schema, such as the
+shards of a sharded deployment, a bounded number at a time.
+
+Each shard is compared against the enums declared by a MetaData, exactly as
+autogenerate would, and the resulting op.sync_enum_values() operations are
+run on it:
+
+    from alembic_autogenerate_enums.fleet import sync_fleet
+
+    results = sync_fleet(shard_urls, Base.metadata, max_workers=16)
+    failed = [result for result in results if result.error is not None]
+
+The module is also a command line tool:
+
+    python -m alembic_autogenerate_enums.fleet myapp.models:Base.metadata --urls-file shards.txt --workers 16
+
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+import sqlalchemy
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+
+from alembic_autogenerate_enums import (RenameEnumValueOp, SyncEnumValuesOp,
+                                        get_declared_enums_by_schema,
+                                        get_defined_enums_by_schema,
+                                        get_sync_enum_values_ops,
+                                        render_enum_op)
+from alembic_autogenerate_enums.snapshot import import_object
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+
+
+@dataclass
+class ShardResult:
+    """
+    Outcome of syncing the enums of one database.
+    """
+    # Database URL, with any password masked
+    url: str
+    # Operations found pending, and applied unless this was a dry run
+    ops: list = field(default_factory=list)
+    # Wall time spent on the shard, including connecting
+    seconds: float = 0.0
+    # String form of the exception that stopped the shard, if any
+    error: Optional[str] = None
+
+    def as_dict(self):
+        return {
+            "url": self.url,
+            "ops": [render_enum_op(op) for op in self.ops],
+            "seconds": self.seconds,
+            "error": self.error,
+        }
+
+
+def mask_url(url):
+    """
+    Return `url` with its password hidden, for reports and logs.
+    """
+    return repr(sqlalchemy.engine.make_url(url))
+
+
+def apply_op(operations, op):
+    """
+    Run `op`, a SyncEnumValuesOp or RenameEnumValueOp, through `operations`,
+    as the migration it renders to would.
+    """
+    if isinstance(op, RenameEnumValueOp):
+        RenameEnumValueOp.rename_enum_value(operations, **vars(op))
+    else:
+        SyncEnumValuesOp.sync_enum_values(operations, **vars(op))
+
+
+def sync_shard(url, declared_by_schema, schemas, dry_run=False, **options):
+    """
+    Compare the enums of the database at `url` with `declared_by_schema` and
+    apply the resulting operations, in one transaction apart from the commits
+    SyncEnumValuesOp itself makes.
+    :returns ShardResult:
+        Failures are recorded on the result rather than raised, so one bad
+        shard doesn't stop the others.
+    """
+    result = ShardResult(mask_url(url))
+    started = time.perf_counter()
+    engine = sqlalchemy.create_engine(url, poolclass=sqlalchemy.pool.NullPool)
+    try:
+        with engine.begin() as conn:
+            defined_by_schema = get_defined_enums_by_schema(conn, schemas)
+            result.ops = get_sync_enum_values_ops(declared_by_schema, defined_by_schema, schemas, **options)
+            if not dry_run:
+                operations = Operations(MigrationContext.configure(conn))
+                for op in result.ops:
+                    apply_op(operations, op)
+    except Exception as e:
+        logger.exception("enum sync failed on %s", result.url)
+        result.error = f"{type(e).__name__}: {e}"
+    finally:
+        engine.dispose()
+        result.seconds = time.perf_counter() - started
+    logger.info(
+        "%s: %d enum operation(s) in %.3fs%s",
+        result.url, len(result.ops), result.seconds, " (failed)" if result.error else "",
+    )
+    return result
+
+
+def sync_fleet(urls, metadata, schemas=None, default="public", max_workers=DEFAULT_WORKERS, dry_run=False,
+               **options):
+    """
+    Bring the enums of every database in `urls` in line with those declared
+    by `metadata`, syncing up to `max_workers` databases at once.
+    :param list schemas:
+        Schema names to compare; defaults to every schema declaring an enum.
+    :param bool dry_run:
+        Only report the pending operations.
+    :param options:
+        Extra get_sync_enum_values_ops() arguments, e.g. lock_timeout="2s".
+    :returns list:
+        ShardResult instances, in the order of `urls`.
+    """
+    declared_by_schema = get_declared_enums_by_schema(metadata, default)
+    if schemas is None:
+        schemas = sorted(declared_by_schema)
+
+    def sync(url):
+        return sync_shard(url, declared_by_schema, schemas, dry_run=dry_run, **options)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(sync, urls))
+
+
+def read_urls(path):
+    """
+    Read one database URL per line, ignoring blank lines and # comments.
+    """
+    with open(path) as f:
+        return [
+            line.strip()
+            for line in f
+            if line.strip() and not line.lstrip().startswith("#")
+        ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m alembic_autogenerate_enums.fleet")
+    parser.add_argument("metadata", help="package.module:metadata")
+    parser.add_argument("--url", action="append", default=[], help="database URL; repeatable")
+    parser.add_argument("--urls-file", help="file with one database URL per line")
+    parser.add_argument("--schema", action="append", help="schema to compare; repeatable")
+    parser.add_argument("--default-schema", default="public")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="databases synced at once")
+    parser.add_argument("--lock-timeout", help="lock_timeout for every statement, e.g. 2s")
+    parser.add_argument("--lock-retries", type=int, default=0)
+    parser.add_argument("--dry-run", action="store_true", help="only report pending operations")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    urls = list(args.url)
+    if args.urls_file:
+        urls.extend(read_urls(args.urls_file))
+    if not urls:
+        parser.error("no database URL given")
+
+    results = sync_fleet(
+        urls,
+        import_object(args.metadata),
+        schemas=args.schema,
+        default=args.default_schema,
+        max_workers=args.workers,
+        dry_run=args.dry_run,
+        lock_timeout=args.lock_timeout,
+        lock_retries=args.lock_retries,
+    )
+    if args.json:
+        print(json.dumps([result.as_dict() for result in results], indent=2))
+    else:
+        for result in results:
+            status = "FAILED" if result.error else "ok"
+            print(f"{status:6} {result.seconds:8.3f}s {len(result.ops):3d} op(s)  {result.url}")
+            if result.error:
+                print(f"       {result.error}")
+    return 1 if any(result.error for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""
+Dry run of the conversion removing values from an enum would do: which
+tables it converts, how big they are and which strategy each one gets.
+
+    python -m alembic_autogenerate_enums.plan --url URL --strategy auto public.color public.size
+
+Exits with status 1 if a table is over --refuse-above-bytes, or if a column
+depending on an enum can't be converted.
+"""
+
+import argparse
+import sys
+
+import sqlalchemy
+
+from alembic_autogenerate_enums import (DEFAULT_ONLINE_ABOVE_BYTES, STRATEGIES,
+                                        SyncEnumValuesError, plan_enum_columns,
+                                        plan_enum_rewrite)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m alembic_autogenerate_enums.plan")
+    parser.add_argument("enums", nargs="+", metavar="schema.name")
+    parser.add_argument("--url", required=True, help="SQLAlchemy database URL")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="rewrite")
+    parser.add_argument("--online-above-bytes", type=int, default=DEFAULT_ONLINE_ABOVE_BYTES)
+    parser.add_argument("--refuse-above-bytes", type=int)
+    args = parser.parse_args(argv)
+
+    status = 0
+    engine = sqlalchemy.create_engine(args.url)
+    with engine.connect() as conn:
+        for qualified_name in args.enums:
+            schema, _, name = qualified_name.rpartition(".")
+            try:
+                affected_columns, _ = plan_enum_columns(conn, schema or "public", name)
+            except SyncEnumValuesError as e:
+                print(e)
+                status = 1
+                continue
+            plan = plan_enum_rewrite(
+                conn, schema or "public", name, affected_columns, args.strategy, args.online_above_bytes,
+                args.refuse_above_bytes,
+            )
+            print(plan.format())
+            if plan.refused:
+                status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Serialized snapshots of enum definitions, so enums can be compared without a
+live PostgreSQL connection.
+
+A snapshot is a JSON document mapping schema names to enum names to their
+values, as returned by get_defined_enums_by_schema():
+
+    {
+        "version": 1,
+        "schemas": {
+            "public": {"my_enum": ["a", "b", "c"]}
+        }
+    }
+
+Snapshots can be taken from a live database or from the enums declared by a
+MetaData, and used for autogenerate in place of the live catalog:
+
+    from alembic_autogenerate_enums.snapshot import EnumSnapshot
+
+    context.configure(
+        ...,
+        defined_enums_source=EnumSnapshot.load("enums.json"),
+    )
+
+The module is also a command line tool:
+
+    python -m alembic_autogenerate_enums.snapshot dump --url URL --schema public -o enums.json
+    python -m alembic_autogenerate_enums.snapshot from-metadata myapp.models:Base.metadata -o enums.json
+    python -m alembic_autogenerate_enums.snapshot diff myapp.models:Base.metadata enums.json
+
+"""
+
+import argparse
+import importlib
+import json
+import sys
+
+import sqlalchemy
+
+from alembic_autogenerate_enums import (DeclaredEnumValues,
+                                        get_declared_enums_by_schema,
+                                        get_defined_enums_by_schema,
+                                        get_sync_enum_values_ops,
+                                        render_enum_op)
+
+SNAPSHOT_VERSION = 1
+
+
+class EnumSnapshot:
+    """
+    Enum definitions by schema, usable anywhere a defined enum source is
+    expected.
+    :param dict enums:
+        Mapping of schema name to DeclaredEnumValues.
+    """
+    def __init__(self, enums):
+        self.enums = enums
+
+    @classmethod
+    def from_connection(cls, conn, schemas):
+        """
+        Snapshot the enums defined in `schemas` of a live database.
+        """
+        return cls(get_defined_enums_by_schema(conn, schemas))
+
+    @classmethod
+    def from_metadata(cls, metadata, default="public"):
+        """
+        Snapshot the enums declared by a SQLAlchemy MetaData, i.e. the state
+        the database will be in once it is migrated.
+        """
+        return cls({
+            schema: DeclaredEnumValues(declared.enum_definitions)
+            for schema, declared in get_declared_enums_by_schema(metadata, default).items()
+        })
+
+    @classmethod
+    def loads(cls, text):
+        document = json.loads(text)
+        if document.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported enum snapshot version {document.get('version')!r}")
+        return cls({
+            schema: DeclaredEnumValues({
+                name: frozenset(values)
+                for name, values in enums.items()
+            })
+            for schema, enums in document["schemas"].items()
+        })
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.loads(f.read())
+
+    def dumps(self):
+        return json.dumps({
+            "version": SNAPSHOT_VERSION,
+            "schemas": {
+                schema: {
+                    name: sorted(values)
+                    for name, values in defined.enum_definitions.items()
+                }
+                for schema, defined in self.enums.items()
+            },
+        }, indent=2, sort_keys=True)
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            f.write(self.dumps() + "\n")
+
+    def get_defined_enums_by_schema(self, conn, schemas):
+        """
+        Defined enum source interface; `conn` is ignored.
+        """
+        return {
+            schema: self.enums.get(schema) or DeclaredEnumValues({})
+            for schema in schemas
+        }
+
+
+def compare_metadata_to_snapshot(metadata, snapshot, schemas=None, default="public", **options):
+    """
+    Return the operations needed to bring the enums of `snapshot` in line
+    with those declared by `metadata`, without touching a database.
+    :param list schemas:
+        Schema names to compare; defaults to every schema declaring an enum.
+    :param options:
+        Extra get_sync_enum_values_ops() arguments.
+    """
+    declared_by_schema = get_declared_enums_by_schema(metadata, default)
+    if schemas is None:
+        schemas = sorted(declared_by_schema)
+    defined_by_schema = snapshot.get_defined_enums_by_schema(None, schemas)
+    return get_sync_enum_values_ops(declared_by_schema, defined_by_schema, schemas, **options)
+
+
+def import_object(spec):
+    """
+    Import an object given as "package.module:attribute.path".
+    """
+    module_name, _, attribute_path = spec.partition(":")
+    obj = importlib.import_module(module_name)
+    for attribute in filter(None, attribute_path.split(".")):
+        obj = getattr(obj, attribute)
+    return obj
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m alembic_autogenerate_enums.snapshot")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    dump = commands.add_parser("dump", help="snapshot the enums of a live database")
+    dump.add_argument("--url", required=True, help="SQLAlchemy database URL")
+    dump.add_argument("--schema", action="append", required=True, help="schema to include; repeatable")
+    dump.add_argument("-o", "--output", required=True)
+
+    from_metadata = commands.add_parser("from-metadata", help="snapshot the enums declared by a MetaData")
+    from_metadata.add_argument("metadata", help="package.module:metadata")
+    from_metadata.add_argument("--default-schema", default="public")
+    from_metadata.add_argument("-o", "--output", required=True)
+
+    diff = commands.add_parser("diff", help="print the enum syncs needed to go from a snapshot to a MetaData")
+    diff.add_argument("metadata", help="package.module:metadata")
+    diff.add_argument("snapshot")
+    diff.add_argument("--schema", action="append", help="schema to compare; repeatable")
+    diff.add_argument("--default-schema", default="public")
+
+    args = parser.parse_args(argv)
+    if args.command == "dump":
+        engine = sqlalchemy.create_engine(args.url)
+        with engine.connect() as conn:
+            EnumSnapshot.from_connection(conn, args.schema).dump(args.output)
+    elif args.command == "from-metadata":
+        metadata = import_object(args.metadata)
+        EnumSnapshot.from_metadata(metadata, args.default_schema).dump(args.output)
+    else:
+        ops = compare_metadata_to_snapshot(
+            import_object(args.metadata),
+            EnumSnapshot.load(args.snapshot),
+            schemas=args.schema,
+            default=args.default_schema,
+        )
+        for op in ops:
+            print(render_enum_op(op))
+        return 1 if ops else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
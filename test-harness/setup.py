@@ -19,6 +19,7 @@ setup(
         "alembic",
         "sqlalchemy",
         "psycopg2",
+        "asyncpg",
         "pytest",
     ]
 )
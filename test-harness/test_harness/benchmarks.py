@@ -0,0 +1,251 @@
+"""
+Benchmarks for alembic-autogenerate-enums.
+
+Comparator benchmarks build a synthetic MetaData and time get_declared_enums,
+get_declared_enums_by_schema and compare_enums without touching a database
+(defined enums come from an EnumSnapshot). Database benchmarks time
+get_defined_enums once per schema, get_defined_enums_by_schema with and
+without an EnumCatalogCache hit, and the add and reverse rewrite paths of
+op.sync_enum_values() against the database from test_harness.database.
+
+    python -m test_harness.benchmarks --output results.json
+    python -m test_harness.benchmarks --db --rows 100000 --rows 1000000 --output results.json
+
+Results are written as JSON so they can be compared across releases.
+"""
+
+import argparse
+import importlib.metadata
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import alembic
+import alembic_autogenerate_enums
+import sqlalchemy
+from alembic.autogenerate.api import AutogenContext
+from alembic.operations import Operations
+from alembic.operations.ops import UpgradeOps
+from alembic.runtime.migration import MigrationContext
+from alembic_autogenerate_enums import (compare_enums, get_declared_enums,
+                                        get_declared_enums_by_schema,
+                                        get_defined_enums,
+                                        get_defined_enums_by_schema)
+from alembic_autogenerate_enums.cache import EnumCatalogCache
+from alembic_autogenerate_enums.snapshot import EnumSnapshot
+from sqlalchemy import Column, Integer, MetaData, Table, text
+
+from test_harness.database import get_url
+
+
+def build_metadata(tables, enums, schemas, columns_per_table=2, values_per_enum=8):
+    """
+    Build a MetaData with `tables` tables spread over `schemas` schemas, each
+    with `columns_per_table` columns using one of `enums` enums per schema.
+    """
+    metadata = MetaData()
+    enum_types = {}
+    for schema_number in range(schemas):
+        schema = f"bench_{schema_number}"
+        enum_types[schema] = [
+            sqlalchemy.Enum(
+                *[f"value_{value}" for value in range(values_per_enum)],
+                name=f"bench_enum_{enum_number}",
+                schema=schema,
+            )
+            for enum_number in range(enums)
+        ]
+    schema_names = sorted(enum_types)
+    for table_number in range(tables):
+        schema = schema_names[table_number % schemas]
+        columns = [
+            Column(f"enum_{column}", enum_types[schema][(table_number + column) % enums])
+            for column in range(columns_per_table)
+        ]
+        Table(f"bench_table_{table_number}", metadata, Column("id", Integer, primary_key=True), *columns,
+              schema=schema)
+    return metadata, schema_names
+
+
+def get_package_version():
+    """
+    Return the installed alembic-autogenerate-enums version, or None when it
+    is imported from a source checkout without being installed.
+    """
+    try:
+        return importlib.metadata.version("alembic-autogenerate-enums")
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def measure(function, repeat):
+    """
+    Call `function` `repeat` times and return timing statistics in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return {
+        "repeat": repeat,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+    }
+
+
+def run_comparator_benchmarks(tables, enums, schemas, repeat):
+    metadata, schema_names = build_metadata(tables, enums, schemas)
+    params = {"tables": tables, "enums": enums, "schemas": schemas}
+
+    # The database holds one value fewer for every enum, so every enum differs.
+    defined = EnumSnapshot({
+        schema: alembic_autogenerate_enums.DeclaredEnumValues({
+            name: values - {"value_0"}
+            for name, values in declared.enum_definitions.items()
+        })
+        for schema, declared in get_declared_enums_by_schema(metadata, "public").items()
+    })
+    migration_context = MigrationContext.configure(
+        dialect_name="postgresql",
+        opts={"target_metadata": metadata, "defined_enums_source": defined},
+    )
+    autogen_context = AutogenContext(migration_context, metadata)
+
+    def run_compare_enums():
+        compare_enums(autogen_context, UpgradeOps([]), schema_names)
+
+    return [
+        {
+            "benchmark": "get_declared_enums",
+            "params": params,
+            "timing": measure(
+                lambda: [get_declared_enums(metadata, schema, "public") for schema in schema_names], repeat
+            ),
+        },
+        {
+            "benchmark": "get_declared_enums_by_schema",
+            "params": params,
+            "timing": measure(lambda: get_declared_enums_by_schema(metadata, "public"), repeat),
+        },
+        {
+            "benchmark": "compare_enums",
+            "params": params,
+            "timing": measure(run_compare_enums, repeat),
+        },
+    ]
+
+
+def run_defined_enums_benchmarks(engine, enums, schemas, repeat):
+    schema_names = [f"bench_{schema}" for schema in range(schemas)]
+    with engine.begin() as conn:
+        for schema in schema_names:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+            conn.execute(text(f"CREATE SCHEMA {schema}"))
+            for enum in range(enums):
+                conn.execute(text(f"CREATE TYPE {schema}.bench_enum_{enum} AS ENUM ('a', 'b', 'c')"))
+    try:
+        with engine.connect() as conn, tempfile.TemporaryDirectory() as directory:
+            per_schema_timing = measure(
+                lambda: [get_defined_enums(conn, schema) for schema in schema_names], repeat
+            )
+            timing = measure(lambda: get_defined_enums_by_schema(conn, schema_names), repeat)
+            cache = EnumCatalogCache(f"{directory}/enums.json")
+            cache.get_defined_enums_by_schema(conn, schema_names)
+            cached_timing = measure(lambda: cache.get_defined_enums_by_schema(conn, schema_names), repeat)
+    finally:
+        with engine.begin() as conn:
+            for schema in schema_names:
+                conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+    params = {"enums": enums, "schemas": schemas}
+    return [
+        {"benchmark": "get_defined_enums", "params": params, "timing": per_schema_timing},
+        {"benchmark": "get_defined_enums_by_schema", "params": params, "timing": timing},
+        {"benchmark": "get_defined_enums_by_schema_cached", "params": params, "timing": cached_timing},
+    ]
+
+
+def prepare_table(engine, rows):
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS bench_rows"))
+        conn.execute(text("DROP TYPE IF EXISTS bench_color"))
+        conn.execute(text("DROP TYPE IF EXISTS bench_color_old"))
+        conn.execute(text("CREATE TYPE bench_color AS ENUM ('red', 'green', 'blue')"))
+        conn.execute(text("CREATE TABLE bench_rows (id bigserial PRIMARY KEY, color bench_color NOT NULL)"))
+        conn.execute(text(
+            "INSERT INTO bench_rows (color) "
+            "SELECT (ARRAY['red', 'green'])[1 + i % 2]::bench_color FROM generate_series(1, :rows) AS i"
+        ), dict(rows=rows))
+        conn.execute(text("ANALYZE bench_rows"))
+
+
+def run_sync_benchmark(engine, rows, **sync_kwargs):
+    prepare_table(engine, rows)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        Operations(MigrationContext.configure(conn)).sync_enum_values("public", "bench_color", **sync_kwargs)
+    return time.perf_counter() - started
+
+
+def run_ddl_benchmarks(engine, row_counts):
+    results = []
+    for rows in row_counts:
+        add = run_sync_benchmark(
+            engine, rows, old_values=["red", "green", "blue"], new_values=["red", "green", "blue", "cyan"],
+        )
+        rewrite = run_sync_benchmark(
+            engine, rows, old_values=["red", "green", "blue"], new_values=["red", "green"],
+            affected_columns=[("bench_rows", "color")], should_reverse=True,
+        )
+        results.append({"benchmark": "sync_enum_values_add", "params": {"rows": rows}, "timing": {"seconds": add}})
+        results.append({
+            "benchmark": "sync_enum_values_rewrite",
+            "params": {"rows": rows},
+            "timing": {"seconds": rewrite},
+        })
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS bench_rows"))
+        conn.execute(text("DROP TYPE IF EXISTS bench_color"))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m test_harness.benchmarks")
+    parser.add_argument("--tables", type=int, default=4000)
+    parser.add_argument("--enums", type=int, default=200, help="enums per schema")
+    parser.add_argument("--schemas", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db", action="store_true", help="also run the database benchmarks")
+    parser.add_argument("--rows", type=int, action="append", help="table size for the DDL benchmarks; repeatable")
+    parser.add_argument("--output", help="write results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = run_comparator_benchmarks(args.tables, args.enums, args.schemas, args.repeat)
+    if args.db:
+        engine = sqlalchemy.create_engine(get_url())
+        results.extend(run_defined_enums_benchmarks(engine, args.enums, args.schemas, args.repeat))
+        results.extend(run_ddl_benchmarks(engine, args.rows or [10 ** 5]))
+
+    report = json.dumps({
+        "environment": {
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "alembic": alembic.__version__,
+            "alembic_autogenerate_enums": get_package_version(),
+        },
+        "results": results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
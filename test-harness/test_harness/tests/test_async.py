@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+import sqlalchemy
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from alembic_autogenerate_enums import (EnumValueInUseError, add_enum_values,
+                                        get_defined_enums, instrument)
+from sqlalchemy import text
+
+from test_harness.database import get_url
+
+pytest.importorskip("asyncpg")
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+
+@pytest.fixture()
+def engine():
+    engine = sqlalchemy.create_engine(get_url())
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS async_first, async_second"))
+        conn.execute(text("DROP TYPE IF EXISTS async_color"))
+        conn.execute(text("DROP TYPE IF EXISTS async_color_old"))
+        conn.execute(text("CREATE TYPE async_color AS ENUM ('red', 'green', 'blue')"))
+        for table_name in ("async_first", "async_second"):
+            conn.execute(text(f"CREATE TABLE {table_name} (id serial PRIMARY KEY, color async_color)"))
+            conn.execute(text(f"INSERT INTO {table_name} (color) VALUES ('red'), ('green')"))
+
+    yield engine
+
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS async_first, async_second"))
+        conn.execute(text("DROP TYPE IF EXISTS async_color"))
+        conn.execute(text("DROP TYPE IF EXISTS async_color_old"))
+
+
+def run_ops(*op_kwargs):
+    """
+    Run op.sync_enum_values() once per item of `op_kwargs`, each in its own
+    transaction on an asyncpg engine, the way an async env.py does.
+    """
+    def run(conn, kwargs):
+        Operations(MigrationContext.configure(conn)).sync_enum_values("public", "async_color", **kwargs)
+
+    async def main():
+        async_engine = create_async_engine(get_url().replace("postgresql://", "postgresql+asyncpg://"))
+        try:
+            for kwargs in op_kwargs:
+                async with async_engine.begin() as conn:
+                    await conn.run_sync(run, kwargs)
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(main())
+
+
+def test_sync_enum_values_on_asyncpg(engine):
+    with instrument(sample_lock_waits=True) as log:
+        run_ops(
+            dict(old_values=["red", "green", "blue"], new_values=["red", "green", "blue", "cyan"]),
+            dict(
+                old_values=["red", "green", "blue", "cyan"], new_values=["red", "green"], affected_columns=[],
+                should_reverse=True, preflight_workers=2,
+            ),
+            dict(
+                old_values=["red", "green"], new_values=["red", "green", "blue"], affected_columns=[],
+                should_reverse=True, strategy="online",
+            ),
+        )
+
+    assert {event.table_name for event in log.events if event.kind == "preflight"} == {
+        "public.async_first", "public.async_second",
+    }
+    assert all(event.lock_wait_time is not None for event in log.events)
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["async_color"] == frozenset(
+            ["red", "green", "blue"]
+        )
+        assert conn.execute(text("SELECT count(*) FROM async_second WHERE color = 'green'")).scalar() == 1
+
+
+def test_preflight_on_asyncpg(engine):
+    with pytest.raises(EnumValueInUseError) as error:
+        run_ops(dict(
+            old_values=["red", "green", "blue"], new_values=["red"], affected_columns=[], should_reverse=True,
+            preflight_workers=2,
+        ))
+    assert (error.value.table_name, error.value.value) == ("public.async_first", "green")
+
+
+def test_transactional_add_values_on_asyncpg(engine):
+    with instrument() as log:
+        run_ops(dict(
+            old_values=["red", "green", "blue"], new_values=["red", "green", "blue", "cyan", "teal"],
+            transactional=True,
+        ))
+
+    assert "transaction" not in {event.kind for event in log.events}
+    assert len([event for event in log.events if event.kind == "add_value"]) == 2
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["async_color"] == frozenset(
+            ["red", "green", "blue", "cyan", "teal"]
+        )
+
+
+def test_large_enum_removal_on_asyncpg(engine):
+    extra = [f"v{i:04d}" for i in range(1500)]
+    with engine.begin() as conn:
+        add_enum_values(conn, "public", "async_color", extra)
+
+    with instrument() as log:
+        run_ops(dict(
+            old_values=["red", "green", "blue"] + extra, new_values=["red", "green"] + extra, affected_columns=[],
+            should_reverse=True, lock_timeout="2s",
+        ))
+
+    assert "ALTER TYPE public.async_color_new RENAME TO async_color" in [event.statement for event in log.events]
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["async_color"] == frozenset(
+            ["red", "green"] + extra
+        )
+        assert conn.execute(text("SELECT count(*) FROM async_second WHERE color = 'green'")).scalar() == 1
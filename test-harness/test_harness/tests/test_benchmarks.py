@@ -0,0 +1,24 @@
+import json
+
+from test_harness.benchmarks import main
+
+
+def test_benchmarks_write_machine_readable_results(tmp_path):
+    output = tmp_path / "results.json"
+    assert main([
+        "--tables", "20", "--enums", "3", "--schemas", "2", "--repeat", "1",
+        "--db", "--rows", "100", "--output", str(output),
+    ]) == 0
+
+    report = json.loads(output.read_text())
+    assert [result["benchmark"] for result in report["results"]] == [
+        "get_declared_enums",
+        "get_declared_enums_by_schema",
+        "compare_enums",
+        "get_defined_enums",
+        "get_defined_enums_by_schema",
+        "get_defined_enums_by_schema_cached",
+        "sync_enum_values_add",
+        "sync_enum_values_rewrite",
+    ]
+    assert set(report["environment"]) == {"python", "sqlalchemy", "alembic", "alembic_autogenerate_enums"}
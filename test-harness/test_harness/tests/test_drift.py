@@ -0,0 +1,62 @@
+import pytest
+import sqlalchemy
+from alembic_autogenerate_enums.drift import (EnumDrift, EnumDriftError,
+                                              assert_no_enum_drift,
+                                              check_enum_drift, main)
+from sqlalchemy import Column, Integer, MetaData, Table, text
+
+from test_harness.database import get_url
+
+
+@pytest.fixture()
+def engine():
+    engine = sqlalchemy.create_engine(get_url())
+    with engine.begin() as conn:
+        conn.execute(text("DROP TYPE IF EXISTS drift_color"))
+        conn.execute(text("DROP TYPE IF EXISTS drift_size"))
+        conn.execute(text("CREATE TYPE drift_color AS ENUM ('red', 'green', 'cyan')"))
+
+    yield engine
+
+    with engine.begin() as conn:
+        conn.execute(text("DROP TYPE IF EXISTS drift_color"))
+        conn.execute(text("DROP TYPE IF EXISTS drift_size"))
+
+
+def build_metadata():
+    metadata = MetaData()
+    Table(
+        "shirt",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("color", sqlalchemy.Enum("red", "green", "blue", name="drift_color")),
+        Column("size", sqlalchemy.Enum("s", "m", name="drift_size")),
+    )
+    return metadata
+
+
+def test_check_enum_drift(engine):
+    metadata = build_metadata()
+    with engine.connect() as conn:
+        assert check_enum_drift(conn, metadata) == [
+            EnumDrift("public", "drift_color", False, ["blue"], ["cyan"]),
+            EnumDrift("public", "drift_size", True, ["m", "s"], []),
+        ]
+        with pytest.raises(EnumDriftError) as error:
+            assert_no_enum_drift(conn, metadata)
+    assert "public.drift_color: missing blue; extra cyan" in str(error.value)
+
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TYPE drift_color ADD VALUE 'blue'"))
+        conn.execute(text("CREATE TYPE drift_size AS ENUM ('s', 'm')"))
+    with engine.connect() as conn:
+        assert_no_enum_drift(conn, metadata)
+        with pytest.raises(EnumDriftError):
+            assert_no_enum_drift(conn, metadata, strict=True)
+
+
+drift_metadata = build_metadata()
+
+
+def test_drift_main(engine):
+    assert main(["test_harness.tests.test_drift:drift_metadata", "--url", get_url(), "--json"]) == 1
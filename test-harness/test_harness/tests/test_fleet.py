@@ -0,0 +1,60 @@
+import pytest
+import sqlalchemy
+from alembic_autogenerate_enums import get_defined_enums
+from alembic_autogenerate_enums.fleet import main, sync_fleet
+from sqlalchemy import Column, Integer, MetaData, Table, text
+
+from test_harness.database import get_url
+
+
+@pytest.fixture()
+def engine():
+    engine = sqlalchemy.create_engine(get_url())
+    with engine.begin() as conn:
+        conn.execute(text("DROP TYPE IF EXISTS fleet_color"))
+        conn.execute(text("CREATE TYPE fleet_color AS ENUM ('red', 'green')"))
+
+    yield engine
+
+    with engine.begin() as conn:
+        conn.execute(text("DROP TYPE IF EXISTS fleet_color"))
+
+
+def build_metadata(*values):
+    metadata = MetaData()
+    Table(
+        "shirt",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("color", sqlalchemy.Enum(*values, name="fleet_color")),
+    )
+    return metadata
+
+
+def test_sync_fleet_reports_each_shard(engine):
+    bad_url = sqlalchemy.engine.make_url(get_url()).set(port=1)
+    urls = [get_url(), bad_url.render_as_string(hide_password=False)]
+    metadata = build_metadata("red", "green", "blue")
+
+    dry_run = sync_fleet(urls, metadata, max_workers=2, dry_run=True)
+    assert [len(result.ops) for result in dry_run] == [1, 0]
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["fleet_color"] == frozenset(["red", "green"])
+
+    ok, failed = sync_fleet(urls, metadata, max_workers=2)
+    assert ok.error is None
+    assert [(op.name, sorted(op.new_values)) for op in ok.ops] == [("fleet_color", ["blue", "green", "red"])]
+    assert failed.error is not None and failed.ops == []
+    assert ok.seconds > 0 and failed.seconds > 0
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["fleet_color"] == frozenset(
+            ["red", "green", "blue"]
+        )
+
+    assert sync_fleet([get_url()], metadata)[0].ops == []
+
+
+def test_fleet_main(engine, tmp_path):
+    urls_file = tmp_path / "shards.txt"
+    urls_file.write_text(f"# shards\n{get_url()}\n\n")
+    assert main(["test_harness.models:Base.metadata", "--urls-file", str(urls_file), "--dry-run", "--json"]) == 0
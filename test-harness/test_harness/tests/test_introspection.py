@@ -0,0 +1,141 @@
+import logging
+
+import sqlalchemy
+from alembic.autogenerate.api import AutogenContext
+from alembic.operations.ops import UpgradeOps
+from alembic.runtime.migration import MigrationContext
+from alembic_autogenerate_enums import (DeclaredEnumValues, compare_enums,
+                                        get_declared_enums,
+                                        get_declared_enums_by_schema,
+                                        get_defined_enums,
+                                        get_defined_enums_by_schema)
+from alembic_autogenerate_enums.cache import (EnumCatalogCache,
+                                              get_catalog_state)
+from alembic_autogenerate_enums.snapshot import EnumSnapshot
+from sqlalchemy import Column, Integer, MetaData, Table, text
+
+from test_harness.database import get_url
+
+
+def test_defined_enums_by_schema():
+    engine = sqlalchemy.create_engine(get_url())
+    with engine.begin() as conn:
+        conn.execute(text("DROP SCHEMA IF EXISTS tenant_a CASCADE"))
+        conn.execute(text("DROP SCHEMA IF EXISTS tenant_b CASCADE"))
+        conn.execute(text("CREATE SCHEMA tenant_a"))
+        conn.execute(text("CREATE SCHEMA tenant_b"))
+        conn.execute(text("CREATE TYPE tenant_a.color AS ENUM ('red', 'green')"))
+        conn.execute(text("CREATE TYPE tenant_b.color AS ENUM ('red')"))
+        conn.execute(text("CREATE TYPE tenant_b.size AS ENUM ('s', 'm')"))
+
+    try:
+        with engine.begin() as conn:
+            by_schema = get_defined_enums_by_schema(conn, ["tenant_a", "tenant_b", "tenant_missing"])
+            assert by_schema["tenant_a"].enum_definitions == {"color": frozenset(["red", "green"])}
+            assert by_schema["tenant_b"].enum_definitions == {
+                "color": frozenset(["red"]),
+                "size": frozenset(["s", "m"]),
+            }
+            assert by_schema["tenant_missing"].enum_definitions == {}
+            assert get_defined_enums(conn, "tenant_b") == by_schema["tenant_b"]
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DROP SCHEMA tenant_a CASCADE"))
+            conn.execute(text("DROP SCHEMA tenant_b CASCADE"))
+
+
+def test_declared_enums_by_schema():
+    metadata = MetaData()
+    color = sqlalchemy.Enum("red", "green", name="color")
+    tenant_color = sqlalchemy.Enum("red", name="color", schema="tenant_a")
+    Table("shirt", metadata, Column("id", Integer, primary_key=True), Column("color", color), Column("trim", color))
+    Table("hat", metadata, Column("id", Integer, primary_key=True), Column("color", tenant_color), schema="tenant_a")
+
+    by_schema = get_declared_enums_by_schema(metadata, "public")
+    assert set(by_schema) == {"public", "tenant_a"}
+    assert by_schema["public"].enum_definitions == {"color": frozenset(["red", "green"])}
+    assert by_schema["public"].columns_by_enum == {"color": [("shirt", "color"), ("shirt", "trim")]}
+    assert by_schema["tenant_a"].enum_definitions == {"color": frozenset(["red"])}
+    assert by_schema["tenant_a"].columns_by_enum == {"color": [("hat", "color")]}
+
+    assert get_declared_enums(metadata, "public", "public") == by_schema["public"]
+    assert get_declared_enums(metadata, "tenant_b", "public").enum_definitions == {}
+
+
+def test_enum_catalog_cache(tmp_path):
+    cache = EnumCatalogCache(str(tmp_path / "enums.json"))
+    engine = sqlalchemy.create_engine(get_url())
+    with engine.begin() as conn:
+        conn.execute(text("DROP SCHEMA IF EXISTS tenant_cache CASCADE"))
+        conn.execute(text("DROP SCHEMA IF EXISTS tenant_cache_renamed CASCADE"))
+        conn.execute(text("CREATE SCHEMA tenant_cache"))
+        conn.execute(text("CREATE TYPE tenant_cache.color AS ENUM ('red')"))
+
+    try:
+        for _ in range(2):
+            with engine.begin() as conn:
+                by_schema = cache.get_defined_enums_by_schema(conn, ["tenant_cache"])
+                assert by_schema["tenant_cache"].enum_definitions == {"color": frozenset(["red"])}
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TYPE tenant_cache.color ADD VALUE 'green'"))
+        with engine.begin() as conn:
+            by_schema = cache.get_defined_enums_by_schema(conn, ["tenant_cache"])
+            assert by_schema["tenant_cache"].enum_definitions == {"color": frozenset(["red", "green"])}
+        assert (cache.hits, cache.misses) == (1, 2)
+
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TYPE tenant_cache.color RENAME VALUE 'green' TO 'lime'"))
+        with engine.begin() as conn:
+            by_schema = cache.get_defined_enums_by_schema(conn, ["tenant_cache"])
+            assert by_schema["tenant_cache"].enum_definitions == {"color": frozenset(["red", "lime"])}
+            assert cache.get_defined_enums_by_schema(conn, ["tenant_cache_renamed"])[
+                "tenant_cache_renamed"].enum_definitions == {}
+            conn.execute(text("ALTER SCHEMA tenant_cache RENAME TO tenant_cache_renamed"))
+        with engine.begin() as conn:
+            by_schema = cache.get_defined_enums_by_schema(conn, ["tenant_cache_renamed"])
+            assert by_schema["tenant_cache_renamed"].enum_definitions == {"color": frozenset(["red", "lime"])}
+        assert (cache.hits, cache.misses) == (1, 5)
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DROP SCHEMA IF EXISTS tenant_cache CASCADE"))
+            conn.execute(text("DROP SCHEMA IF EXISTS tenant_cache_renamed CASCADE"))
+
+
+
+def test_catalog_state_identifies_the_cluster():
+    engine = sqlalchemy.create_engine(get_url())
+    with engine.connect() as conn:
+        system_identifier = conn.execute(text("SELECT system_identifier FROM pg_control_system()")).scalar()
+        identity, _ = get_catalog_state(conn)
+    assert identity.startswith(f"{system_identifier}@")
+
+def test_compare_enums_profiler(caplog, monkeypatch):
+    # Migration tests load alembic.ini's logging config, which disables
+    # loggers it doesn't list.
+    monkeypatch.setattr(logging.getLogger("alembic_autogenerate_enums"), "disabled", False)
+    metadata = MetaData()
+    color = sqlalchemy.Enum("red", "green", name="color", schema="public")
+    Table("shirt", metadata, Column("id", Integer, primary_key=True), Column("color", color), Column("trim", color))
+    snapshot = EnumSnapshot({"public": DeclaredEnumValues({"color": frozenset(["red"])})})
+
+    profiles = []
+    for profiler in (profiles.append, True):
+        migration_context = MigrationContext.configure(dialect_name="postgresql", opts={
+            "target_metadata": metadata,
+            "defined_enums_source": snapshot,
+            "enum_comparator_profiler": profiler,
+        })
+        with caplog.at_level(logging.INFO, logger="alembic_autogenerate_enums"):
+            compare_enums(AutogenContext(migration_context, metadata), UpgradeOps([]), ["public"])
+
+    profile, = profiles
+    assert set(profile.phases) == {"introspection", "metadata", "diff", "ops"}
+    assert profile.total >= 0
+    assert (
+        profile.schemas, profile.declared_enums, profile.defined_enums, profile.columns, profile.changed_enums,
+        profile.ops,
+    ) == (1, 1, 1, 2, 1, 1)
+    record, = [record for record in caplog.records if hasattr(record, "enum_comparator_profile")]
+    assert record.enum_comparator_profile["ops"] == 1
@@ -0,0 +1,80 @@
+import sqlalchemy
+from alembic.operations.ops import UpgradeOps
+from alembic_autogenerate_enums import DeclaredEnumValues, render_enum_op
+from alembic_autogenerate_enums.snapshot import (EnumSnapshot,
+                                                 compare_metadata_to_snapshot,
+                                                 main)
+from sqlalchemy import Column, Integer, MetaData, Table
+
+from test_harness.database import get_url
+from test_harness.models import Base, SimpleEnum
+
+
+def build_metadata(*values):
+    metadata = MetaData()
+    Table(
+        "shirt",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("color", sqlalchemy.Enum(*values, name="color")),
+    )
+    return metadata
+
+
+def test_snapshot_round_trip(tmp_path):
+    snapshot = EnumSnapshot.from_metadata(build_metadata("red", "green"))
+    path = str(tmp_path / "enums.json")
+    snapshot.dump(path)
+
+    loaded = EnumSnapshot.load(path)
+    assert loaded.get_defined_enums_by_schema(None, ["public", "other"]) == {
+        "public": DeclaredEnumValues({"color": frozenset(["red", "green"])}),
+        "other": DeclaredEnumValues({}),
+    }
+
+
+def test_compare_metadata_to_snapshot(tmp_path):
+    snapshot = EnumSnapshot.from_metadata(build_metadata("red", "green"))
+    ops = compare_metadata_to_snapshot(build_metadata("red", "green", "blue"), snapshot)
+    assert [(op.schema, op.name, sorted(op.new_values), op.affected_columns) for op in ops] == [
+        ("public", "color", ["blue", "green", "red"], [("shirt", "color")]),
+    ]
+    assert compare_metadata_to_snapshot(build_metadata("red", "green"), snapshot) == []
+
+    path = str(tmp_path / "enums.json")
+    snapshot.dump(path)
+    assert main(["diff", "test_harness.models:Base.metadata", path]) == 0
+
+
+def test_snapshot_from_connection(clear_db, alembic_config, tmp_path):
+    from alembic import command
+
+    command.upgrade(alembic_config, "head")
+    path = str(tmp_path / "enums.json")
+    assert main(["dump", "--url", get_url(), "--schema", "public", "-o", path]) == 0
+
+    defined = EnumSnapshot.load(path).get_defined_enums_by_schema(None, ["public"])["public"]
+    assert defined.enum_definitions["simpleenum"] == frozenset(item.value for item in SimpleEnum)
+    assert compare_metadata_to_snapshot(Base.metadata, EnumSnapshot.load(path)) == []
+
+
+def test_compare_detects_renames():
+    snapshot = EnumSnapshot.from_metadata(build_metadata("red", "green"))
+    metadata = build_metadata("red", "lime", "blue")
+    metadata.tables["shirt"].c.color.info["enum_value_renames"] = {"green": "lime"}
+
+    ops = compare_metadata_to_snapshot(metadata, snapshot)
+    assert [render_enum_op(op) for op in ops] == [
+        "op.rename_enum_value('public', 'color', 'green', 'lime')",
+        "op.sync_enum_values('public', 'color', ['lime', 'red'], ['blue', 'lime', 'red'], "
+        "[('shirt', 'color')], False)",
+    ]
+    assert [render_enum_op(op) for op in UpgradeOps(ops).reverse().ops] == [
+        "op.sync_enum_values('public', 'color', ['blue', 'lime', 'red'], ['lime', 'red'], "
+        "[('shirt', 'color')], True)",
+        "op.rename_enum_value('public', 'color', 'lime', 'green')",
+    ]
+
+    ops = compare_metadata_to_snapshot(build_metadata("red", "lime"), snapshot, detect_renames=True)
+    assert [render_enum_op(op) for op in ops] == ["op.rename_enum_value('public', 'color', 'green', 'lime')"]
+    assert len(compare_metadata_to_snapshot(build_metadata("red", "lime"), snapshot)) == 1
@@ -0,0 +1,889 @@
+import logging
+import threading
+import time
+
+import alembic_autogenerate_enums
+import pytest
+import sqlalchemy
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from alembic_autogenerate_enums import (
+    EnumLockTimeoutError, EnumRewriteTooLargeError, EnumValueInUseError,
+    EnumValuesMismatchError, RenameEnumValueOp, SyncEnumValuesAcrossSchemasOp,
+    SyncEnumValuesError, SyncEnumValuesOp, add_enum_values, convert_partitions,
+    deferred_enum_sync, delta_sync_enum_values_ops, enum_values_hash,
+    fan_out_sync_enum_values_ops, get_defined_enums,
+    get_defined_enums_by_schema, get_enum_columns, get_partitions,
+    get_table_costs, instrument, managed_connections, plan,
+    render_rename_enum_value_op, render_sync_enum_value_op,
+    render_sync_enum_values_across_schemas_op,
+    render_sync_enum_values_delta_op)
+from sqlalchemy import text
+
+from test_harness.database import get_url
+
+
+@pytest.fixture()
+def engine():
+    engine = sqlalchemy.create_engine(get_url())
+    with engine.begin() as conn:
+        conn.execute(text(
+            "DROP TABLE IF EXISTS sync_target, sync_other, sync_other_1, sync_other_2, sync_other_rest, "
+            "alembic_enum_sync_journal CASCADE"
+        ))
+        conn.execute(text("DROP DOMAIN IF EXISTS sync_color_domain"))
+        conn.execute(text("DROP TYPE IF EXISTS sync_color"))
+        conn.execute(text("DROP TYPE IF EXISTS sync_color_old"))
+        conn.execute(text("DROP TYPE IF EXISTS sync_color_new"))
+        conn.execute(text("CREATE TYPE sync_color AS ENUM ('red', 'green', 'blue')"))
+        conn.execute(text(
+            "CREATE TABLE sync_target (id serial PRIMARY KEY, main sync_color NOT NULL, trim sync_color)"
+        ))
+        conn.execute(text("INSERT INTO sync_target (main, trim) VALUES ('red', 'green'), ('green', NULL)"))
+
+    yield engine
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            "DROP TABLE IF EXISTS sync_target, sync_other, sync_other_1, sync_other_2, sync_other_rest, "
+            "alembic_enum_sync_journal CASCADE"
+        ))
+        conn.execute(text("DROP DOMAIN IF EXISTS sync_color_domain"))
+        conn.execute(text("DROP TYPE IF EXISTS sync_color"))
+        conn.execute(text("DROP TYPE IF EXISTS sync_color_old"))
+        conn.execute(text("DROP TYPE IF EXISTS sync_color_new"))
+
+
+def run_op(engine, **kwargs):
+    with engine.begin() as conn:
+        op = Operations(MigrationContext.configure(conn))
+        op.sync_enum_values(**kwargs)
+
+
+def test_reverse_converts_every_column_of_a_table(engine):
+    run_op(
+        engine,
+        schema="public",
+        name="sync_color",
+        old_values=["red", "green", "blue"],
+        new_values=["red", "green"],
+        affected_columns=[("sync_target", "main"), ("sync_target", "trim")],
+        should_reverse=True,
+    )
+
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(["red", "green"])
+        rows = conn.execute(text("SELECT main::text, trim::text FROM sync_target ORDER BY id")).fetchall()
+        assert [tuple(row) for row in rows] == [("red", "green"), ("green", None)]
+
+
+def test_reverse_online_strategy(engine):
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE sync_target ALTER COLUMN main SET DEFAULT 'red'"))
+        conn.execute(text("CREATE INDEX sync_target_main_idx ON sync_target (main)"))
+        conn.execute(text("INSERT INTO sync_target (trim) SELECT 'green' FROM generate_series(1, 25)"))
+
+    run_op(
+        engine,
+        schema="public",
+        name="sync_color",
+        old_values=["red", "green", "blue"],
+        new_values=["red", "green"],
+        affected_columns=[("sync_target", "main"), ("sync_target", "trim")],
+        should_reverse=True,
+        strategy="online",
+        batch_size=10,
+    )
+
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(["red", "green"])
+        columns = conn.execute(text(
+            "SELECT attname, format_type(atttypid, NULL), attnotnull FROM pg_attribute "
+            "WHERE attrelid = 'sync_target'::regclass AND attnum > 0 AND NOT attisdropped ORDER BY attnum"
+        )).fetchall()
+        assert [tuple(column) for column in columns] == [
+            ("id", "integer", True),
+            ("main", "sync_color", True),
+            ("trim", "sync_color", False),
+        ]
+        assert conn.execute(text("SELECT count(*) FROM sync_target WHERE main = 'red'")).scalar() == 26
+        assert conn.execute(text("SELECT count(*) FROM sync_target WHERE trim = 'green'")).scalar() == 26
+        assert conn.execute(text(
+            "SELECT indexdef FROM pg_indexes WHERE indexname = 'sync_target_main_idx'"
+        )).scalar() == "CREATE INDEX sync_target_main_idx ON public.sync_target USING btree (main)"
+        conn.execute(text("INSERT INTO sync_target (trim) VALUES (NULL)"))
+
+
+
+@pytest.mark.parametrize("failing_kind", ["backfill", "create_index"])
+def test_online_strategy_resumes_after_a_failure(engine, monkeypatch, failing_kind):
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE sync_target ALTER COLUMN main SET DEFAULT 'red'"))
+        conn.execute(text("CREATE INDEX sync_target_main_idx ON sync_target (main)"))
+        conn.execute(text("INSERT INTO sync_target (trim) SELECT 'green' FROM generate_series(1, 25)"))
+
+    execute_statement = alembic_autogenerate_enums.execute_statement
+    calls = []
+
+    def fail_second(conn, kind, *args, **kwargs):
+        if kind == failing_kind:
+            calls.append(kind)
+            if len(calls) == 2:
+                raise RuntimeError("interrupted")
+        return execute_statement(conn, kind, *args, **kwargs)
+
+    monkeypatch.setattr(alembic_autogenerate_enums, "execute_statement", fail_second)
+    with pytest.raises(RuntimeError):
+        run_op(engine, strategy="online", batch_size=10, **REMOVE_BLUE)
+    monkeypatch.setattr(alembic_autogenerate_enums, "execute_statement", execute_statement)
+    with engine.begin() as conn:
+        assert conn.execute(text("SELECT to_regtype('sync_color_old')")).scalar() is not None
+        assert conn.execute(text("SELECT step FROM alembic_enum_sync_journal")).scalar() == (
+            "online" if failing_kind == "backfill" else "index"
+        )
+
+    run_op(engine, strategy="online", batch_size=10, **REMOVE_BLUE)
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(["red", "green"])
+        columns = conn.execute(text(
+            "SELECT attname, format_type(atttypid, NULL), attnotnull FROM pg_attribute "
+            "WHERE attrelid = 'sync_target'::regclass AND attnum > 0 AND NOT attisdropped ORDER BY attnum"
+        )).fetchall()
+        assert [tuple(column) for column in columns] == [
+            ("id", "integer", True),
+            ("main", "sync_color", True),
+            ("trim", "sync_color", False),
+        ]
+        assert conn.execute(text("SELECT count(*) FROM sync_target WHERE main = 'red'")).scalar() == 26
+        assert conn.execute(text(
+            "SELECT indexdef FROM pg_indexes WHERE indexname = 'sync_target_main_idx'"
+        )).scalar() == "CREATE INDEX sync_target_main_idx ON public.sync_target USING btree (main)"
+        assert conn.execute(text(
+            "SELECT count(*) FROM pg_trigger WHERE tgrelid = 'sync_target'::regclass"
+        )).scalar() == 0
+        assert conn.execute(text("SELECT to_regtype('sync_color_old')")).scalar() is None
+        assert conn.execute(text("SELECT to_regclass('alembic_enum_sync_journal')")).scalar() is None
+        conn.execute(text("INSERT INTO sync_target (trim) VALUES (NULL)"))
+
+def test_reverse_converts_discovered_columns(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE sync_other (id serial PRIMARY KEY, colors sync_color[], color sync_color)"))
+        conn.execute(text("INSERT INTO sync_other (colors, color) VALUES ('{red,green}', 'red'), (NULL, NULL)"))
+        assert [(column.table_name, column.column_name, column.kind) for column in get_enum_columns(
+            conn, "public", "sync_color"
+        )] == [
+            ("sync_other", "colors", "array"),
+            ("sync_other", "color", "scalar"),
+            ("sync_target", "main", "scalar"),
+            ("sync_target", "trim", "scalar"),
+        ]
+
+    # sync_other isn't listed, as when it belongs to another application.
+    run_op(
+        engine,
+        schema="public",
+        name="sync_color",
+        old_values=["red", "green", "blue"],
+        new_values=["red", "green"],
+        affected_columns=[("sync_target", "main"), ("sync_target", "trim")],
+        should_reverse=True,
+    )
+
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(["red", "green"])
+        rows = conn.execute(text("SELECT colors::text[], color::text FROM sync_other ORDER BY id")).fetchall()
+        assert [tuple(row) for row in rows] == [(["red", "green"], "red"), (None, None)]
+
+
+def test_reverse_rejects_array_values_in_use(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE sync_other (id serial PRIMARY KEY, colors sync_color[])"))
+        conn.execute(text("INSERT INTO sync_other (colors) VALUES ('{red}'), ('{green,blue}')"))
+
+    with pytest.raises(EnumValueInUseError) as error:
+        run_op(
+            engine,
+            schema="public",
+            name="sync_color",
+            old_values=["red", "green", "blue"],
+            new_values=["red", "green"],
+            affected_columns=[],
+            should_reverse=True,
+        )
+    assert (error.value.table_name, error.value.column_name, error.value.value) == (
+        "public.sync_other", "colors", "blue"
+    )
+
+
+def test_reverse_rejects_domains_before_any_change(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE DOMAIN sync_color_domain AS sync_color"))
+        conn.execute(text("CREATE TABLE sync_other (id serial PRIMARY KEY, color sync_color_domain)"))
+
+    with pytest.raises(SyncEnumValuesError, match="sync_other.color"):
+        run_op(
+            engine,
+            schema="public",
+            name="sync_color",
+            old_values=["red", "green", "blue"],
+            new_values=["red", "green"],
+            affected_columns=[("sync_target", "main"), ("sync_target", "trim")],
+            should_reverse=True,
+        )
+
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(["red", "green", "blue"])
+
+
+def test_render_records_strategy():
+    op = SyncEnumValuesOp("public", "color", ["b", "a"], ["a"], [("t", "c")], strategy="online", batch_size=500)
+    assert render_sync_enum_value_op(None, op) == (
+        "op.sync_enum_values('public', 'color', ['a', 'b'], ['a'], [('t', 'c')], False, "
+        "strategy='online', batch_size=500)"
+    )
+    assert render_sync_enum_value_op(None, op.reverse()).endswith("True, strategy='online', batch_size=500)")
+
+
+@pytest.mark.parametrize("preflight_workers", [1, 2])
+def test_reverse_preflight_rejects_values_in_use(engine, preflight_workers):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE sync_other (id serial PRIMARY KEY, color sync_color)"))
+        conn.execute(text("INSERT INTO sync_other (color) SELECT 'blue' FROM generate_series(1, 10)"))
+        conn.execute(text("ANALYZE sync_other"))
+
+    with pytest.raises(EnumValueInUseError) as error:
+        run_op(
+            engine,
+            schema="public",
+            name="sync_color",
+            old_values=["red", "green", "blue"],
+            new_values=["red", "green"],
+            affected_columns=[("sync_target", "main"), ("sync_target", "trim"), ("sync_other", "color")],
+            should_reverse=True,
+            preflight_workers=preflight_workers,
+        )
+    assert (error.value.table_name, error.value.column_name, error.value.value) == (
+        "public.sync_other", "color", "blue"
+    )
+
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(["red", "green", "blue"])
+
+
+def test_transactional_add_values(engine):
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        Operations(MigrationContext.configure(conn)).sync_enum_values(
+            "public", "sync_color", ["red", "green", "blue"], ["red", "green", "blue", "it's", "a:b"],
+            transactional=True,
+        )
+        defined = get_defined_enums(conn, "public").enum_definitions["sync_color"]
+        assert defined == frozenset(["red", "green", "blue", "it's", "a:b"])
+        transaction.rollback()
+
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(["red", "green", "blue"])
+
+
+class EngineBoundOperations:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def get_bind(self):
+        return self.engine
+
+
+def test_engine_bind_connections_are_reused_and_closed(engine):
+    operations = EngineBoundOperations(engine)
+    with managed_connections() as manager:
+        SyncEnumValuesOp.sync_enum_values(operations, "public", "sync_color", ["red"], ["red", "cyan"])
+        SyncEnumValuesOp.sync_enum_values(operations, "public", "sync_color", ["red"], ["red", "magenta"])
+        assert engine.pool.checkedout() == 1
+    assert manager.opened == 1
+    assert engine.pool.checkedout() == 0
+
+    SyncEnumValuesOp.sync_enum_values(operations, "public", "sync_color", ["red"], ["red", "yellow"])
+    assert engine.pool.checkedout() == 0
+
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(
+            ["red", "green", "blue", "cyan", "magenta", "yellow"]
+        )
+
+
+def hold_lock(engine, seconds):
+    """
+    Hold an ACCESS SHARE lock on sync_target from another connection for
+    `seconds`; returns the thread holding it.
+    """
+    locked = threading.Event()
+
+    def run():
+        with engine.begin() as conn:
+            conn.execute(text("LOCK TABLE sync_target IN ACCESS SHARE MODE"))
+            locked.set()
+            time.sleep(seconds)
+
+    holder = threading.Thread(target=run)
+    holder.start()
+    locked.wait()
+    return holder
+
+
+def test_instrumentation_reports_statements_and_lock_waits(engine):
+    holder = hold_lock(engine, 0.5)
+
+    events = []
+    with instrument(listener=events.append, sample_lock_waits=True, interval=0.02) as log:
+        run_op(
+            engine,
+            schema="public",
+            name="sync_color",
+            old_values=["red", "green", "blue"],
+            new_values=["red", "green"],
+            affected_columns=[("sync_target", "main"), ("sync_target", "trim")],
+            should_reverse=True,
+        )
+    holder.join()
+
+    assert events == log.events
+    assert [event.kind for event in events if event.kind not in ("catalog", "preflight")] == [
+        "rename_type", "create_type", "alter_table", "drop_type",
+    ]
+    assert {(event.schema, event.type_name) for event in events} == {("public", "sync_color")}
+    alter_table = next(event for event in events if event.kind == "alter_table")
+    assert alter_table.table_name == "public.sync_target"
+    assert alter_table.lock_wait_time > 0.1
+
+    summary = log.summary()
+    assert summary["statements"] == len(events)
+    assert summary["by_kind"]["alter_table"]["statements"] == 1
+
+
+REMOVE_BLUE = dict(
+    schema="public",
+    name="sync_color",
+    old_values=["red", "green", "blue"],
+    new_values=["red", "green"],
+    affected_columns=[("sync_target", "main"), ("sync_target", "trim")],
+    should_reverse=True,
+)
+
+
+def test_preflight_ignores_values_the_enum_does_not_have(engine):
+    run_op(engine, **dict(REMOVE_BLUE, old_values=["red", "green", "blue", "purple"]))
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(["red", "green"])
+
+
+@pytest.mark.parametrize("options", [{}, {"strategy": "online"}, {"by_partition": True}])
+def test_columns_needing_quotes(engine, options):
+    with engine.begin() as conn:
+        if options.get("by_partition"):
+            conn.execute(text(
+                'CREATE TABLE sync_other (id int NOT NULL, "Color" sync_color NOT NULL, '
+                '"Shades" sync_color[]) PARTITION BY RANGE (id)'
+            ))
+            conn.execute(text("CREATE TABLE sync_other_1 PARTITION OF sync_other FOR VALUES FROM (0) TO (100)"))
+        else:
+            conn.execute(text(
+                'CREATE TABLE sync_other (id serial PRIMARY KEY, "Color" sync_color NOT NULL, '
+                '"Shades" sync_color[])'
+            ))
+        conn.execute(text('''INSERT INTO sync_other (id, "Color", "Shades") VALUES (1, 'green', '{red,green}')'''))
+
+    run_op(engine, **options, **REMOVE_BLUE)
+
+    with engine.begin() as conn:
+        assert conn.execute(text('''SELECT "Color"::text, "Shades"::text FROM sync_other''')).fetchall() == [
+            ("green", "{red,green}"),
+        ]
+        assert dict(conn.execute(text(
+            "SELECT attname, atttypid::regtype::text FROM pg_attribute "
+            "WHERE attrelid = 'sync_other'::regclass AND attname IN ('Color', 'Shades')"
+        )).fetchall()) == {"Color": "sync_color", "Shades": "sync_color[]"}
+
+
+def test_lock_retries_wait_for_the_lock_holder(engine):
+    holder = hold_lock(engine, 0.6)
+    with instrument() as log:
+        run_op(engine, lock_timeout=100, lock_retries=10, **REMOVE_BLUE)
+    holder.join()
+
+    locks = [event for event in log.events if event.kind == "lock"]
+    assert {event.statement for event in locks} == {"LOCK TABLE public.sync_target IN ACCESS EXCLUSIVE MODE NOWAIT"}
+    assert len(locks) > 1
+    assert locks[0].error is not None and locks[-1].error is None
+    assert len([event for event in log.events if event.kind == "rename_type"]) == 1
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(["red", "green"])
+        assert conn.execute(text("SHOW lock_timeout")).scalar() == "0"
+
+
+def test_lock_deadline_gives_up_cleanly(engine):
+    holder = hold_lock(engine, 2)
+    started = time.monotonic()
+    with pytest.raises(EnumLockTimeoutError):
+        run_op(engine, lock_timeout="100ms", lock_retries=10, lock_deadline=0.5, **REMOVE_BLUE)
+    assert time.monotonic() - started < 1.5
+    holder.join()
+
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(["red", "green", "blue"])
+
+
+def test_prebuilt_type_is_dropped_when_the_swap_fails(engine):
+    extra = [f"v{i:04d}" for i in range(1200)]
+    with engine.begin() as conn:
+        add_enum_values(conn, "public", "sync_color", extra)
+        conn.execute(text("UPDATE sync_target SET trim = 'blue' WHERE trim IS NULL"))
+    remove_blue = dict(
+        REMOVE_BLUE, old_values=REMOVE_BLUE["old_values"] + extra, new_values=REMOVE_BLUE["new_values"] + extra,
+    )
+
+    with pytest.raises(sqlalchemy.exc.DataError):
+        run_op(engine, preflight=False, **remove_blue)
+    with engine.begin() as conn:
+        assert set(get_defined_enums(conn, "public").enum_definitions) & {"sync_color_new", "sync_color_old"} == set()
+        conn.execute(text("UPDATE sync_target SET trim = NULL WHERE trim = 'blue'"))
+        # As if a crash had prevented the cleanup.
+        conn.execute(text("CREATE TYPE sync_color_new AS ENUM ('red')"))
+
+    run_op(engine, **remove_blue)
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(["red", "green"] + extra)
+
+
+def test_lock_policy_after_a_committing_op(engine):
+    with engine.begin() as conn:
+        op = Operations(MigrationContext.configure(conn))
+        op.sync_enum_values("public", "sync_color", ["red", "green", "blue"], ["red", "green", "blue", "white"])
+        op.sync_enum_values(lock_timeout="2s", **dict(REMOVE_BLUE, old_values=["red", "green", "blue", "white"]))
+
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(["red", "green"])
+
+
+@pytest.fixture()
+def tenants(engine):
+    schemas = ["sync_tenant_a", "sync_tenant_b", "sync_tenant_c", "sync_tenant_d"]
+    with engine.begin() as conn:
+        for schema in schemas:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+            conn.execute(text(f"CREATE SCHEMA {schema}"))
+        for schema, values in [
+            ("sync_tenant_a", "'red', 'green'"),
+            ("sync_tenant_b", "'red', 'green'"),
+            ("sync_tenant_c", "'red', 'green', 'blue'"),
+        ]:
+            conn.execute(text(f"CREATE TYPE {schema}.color AS ENUM ({values})"))
+            conn.execute(text(f"CREATE TABLE {schema}.shirt (id serial PRIMARY KEY, color {schema}.color)"))
+            conn.execute(text(f"INSERT INTO {schema}.shirt (color) VALUES ('red')"))
+
+    yield schemas
+
+    with engine.begin() as conn:
+        for schema in schemas:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+
+
+def test_sync_enum_values_across_schemas(engine, tenants):
+    ops = fan_out_sync_enum_values_ops([
+        SyncEnumValuesOp(schema, "color", ["red", "green"], ["red", "green", "blue"], [("shirt", "color")])
+        for schema in tenants
+    ] + [SyncEnumValuesOp("public", "other", ["a"], ["a", "b"], [("t", "c")])])
+    assert [type(op) for op in ops] == [SyncEnumValuesAcrossSchemasOp, SyncEnumValuesOp]
+    fan_out = ops[0]
+    assert render_sync_enum_values_across_schemas_op(None, fan_out) == (
+        "op.sync_enum_values_across_schemas('color', %r, ['blue'], [], [('shirt', 'color')], False)" % (tenants,)
+    )
+
+    def values():
+        with engine.begin() as conn:
+            defined = get_defined_enums_by_schema(conn, tenants)
+            return [sorted(defined[schema].enum_definitions.get("color", [])) for schema in tenants]
+
+    def run(op):
+        with engine.begin() as conn:
+            Operations(MigrationContext.configure(conn)).sync_enum_values_across_schemas(
+                op.name, op.schemas, op.added_values, op.removed_values, op.affected_columns, op.should_reverse,
+                **op.options,
+            )
+
+    with instrument() as log:
+        run(fan_out)
+    assert values() == [["blue", "green", "red"]] * 3 + [[]]
+    assert {event.schema for event in log.events if event.kind == "add_value"} == {"sync_tenant_a", "sync_tenant_b"}
+
+    run(fan_out.reverse())
+    assert values() == [["green", "red"]] * 3 + [[]]
+
+
+def test_sync_enum_values_across_schemas_skips_removals_going_forward(engine, tenants, caplog, monkeypatch):
+    monkeypatch.setattr(logging.getLogger("alembic_autogenerate_enums"), "disabled", False)
+    with instrument() as log, caplog.at_level(logging.INFO, logger="alembic_autogenerate_enums"):
+        with engine.begin() as conn:
+            Operations(MigrationContext.configure(conn)).sync_enum_values_across_schemas(
+                "color", tenants, ["blue"], ["red"], [("shirt", "color")], False,
+            )
+
+    assert {event.schema for event in log.events if event.kind == "add_value"} == {"sync_tenant_a", "sync_tenant_b"}
+    assert "enum color: 2 of 4 schemas already up to date" in caplog.messages
+
+
+def test_auto_strategy_picks_online_for_big_tables(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE sync_other (id serial PRIMARY KEY, color sync_color)"))
+        conn.execute(text("INSERT INTO sync_other (color) SELECT 'red' FROM generate_series(1, 5000)"))
+        conn.execute(text("ANALYZE sync_other"))
+
+    with instrument() as log:
+        run_op(engine, strategy="auto", online_above_bytes=100000, **REMOVE_BLUE)
+
+    assert {event.table_name for event in log.events if event.kind == "backfill"} == {"public.sync_other"}
+    rewritten = [event.table_name for event in log.events if event.kind == "alter_table" and " TYPE " in event.statement]
+    assert rewritten == ["public.sync_target"]
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(["red", "green"])
+        assert conn.execute(text("SELECT count(*) FROM sync_other WHERE color = 'red'")).scalar() == 5000
+
+
+def test_refuse_above_bytes(engine):
+    with pytest.raises(EnumRewriteTooLargeError) as error:
+        run_op(engine, refuse_above_bytes=1, **REMOVE_BLUE)
+    assert [table.cost.table_name for table in error.value.plan.refused] == ["public.sync_target"]
+    assert "public.sync_target (main, trim)" in str(error.value)
+
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(["red", "green", "blue"])
+
+    assert plan.main(["--url", get_url(), "--strategy", "auto", "public.sync_color"]) == 0
+    assert plan.main(["--url", get_url(), "--refuse-above-bytes", "1", "public.sync_color"]) == 1
+
+
+def test_rename_enum_value(engine):
+    with instrument() as log:
+        with engine.begin() as conn:
+            Operations(MigrationContext.configure(conn)).rename_enum_value("public", "sync_color", "green", "lime")
+
+    assert [event.statement for event in log.events] == ["ALTER TYPE public.sync_color RENAME VALUE 'green' TO 'lime'"]
+    with engine.begin() as conn:
+        rows = conn.execute(text("SELECT main::text, trim::text FROM sync_target ORDER BY id")).fetchall()
+        assert [tuple(row) for row in rows] == [("red", "lime"), ("lime", None)]
+
+    op = RenameEnumValueOp("public", "sync_color", "green", "lime").reverse()
+    assert render_rename_enum_value_op(None, op) == "op.rename_enum_value('public', 'sync_color', 'lime', 'green')"
+
+
+def test_concurrent_indexes(engine):
+    definitions = [
+        "CREATE INDEX sync_target_main_idx ON public.sync_target USING btree (main)",
+        "CREATE INDEX sync_target_trim_idx ON public.sync_target USING btree (id) "
+        "WHERE (\"trim\" = 'green'::sync_color)",
+    ]
+    unique = "CREATE UNIQUE INDEX sync_target_unique_idx ON public.sync_target USING btree (id, main)"
+    with engine.begin() as conn:
+        for definition in definitions + [unique]:
+            conn.execute(text(definition))
+
+    with instrument() as log:
+        run_op(engine, concurrent_indexes=True, maintenance_work_mem="96MB", **REMOVE_BLUE)
+
+    kinds = [event.kind for event in log.events if event.kind not in ("catalog", "preflight", "journal")]
+    assert kinds[:kinds.index("alter_table") + 1] == [
+        "rename_type", "create_type", "journal_table", "drop_index", "drop_index", "alter_table",
+    ]
+    statements = [event.statement for event in log.events if event.kind in ("create_index", "transaction")]
+    assert "SET maintenance_work_mem = '96MB'" in statements
+    assert [statement for statement in statements if statement.startswith("CREATE INDEX CONCURRENTLY")] == [
+        definition.replace(" INDEX ", " INDEX CONCURRENTLY ", 1) for definition in definitions
+    ]
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(["red", "green"])
+        rows = conn.execute(text(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = 'sync_target' AND indexname <> 'sync_target_pkey' "
+            "ORDER BY indexname"
+        )).fetchall()
+        assert [row[0] for row in rows] == definitions + [unique]
+        assert conn.execute(text("SHOW maintenance_work_mem")).scalar() != "96MB"
+
+
+def test_concurrent_indexes_survive_a_failed_rebuild(engine, monkeypatch, caplog):
+    monkeypatch.setattr(logging.getLogger("alembic_autogenerate_enums"), "disabled", False)
+    definitions = [
+        "CREATE INDEX sync_target_main_idx ON public.sync_target USING btree (main)",
+        "CREATE INDEX sync_target_trim_idx ON public.sync_target USING btree (\"trim\")",
+    ]
+    with engine.begin() as conn:
+        for definition in definitions:
+            conn.execute(text(definition))
+
+    rebuild = alembic_autogenerate_enums.rebuild_index_concurrently
+
+    def rebuild_once(conn, table_name, index_name, *args):
+        monkeypatch.setattr(alembic_autogenerate_enums, "rebuild_index_concurrently", fail)
+        rebuild(conn, table_name, index_name, *args)
+
+    def fail(*args):
+        raise RuntimeError("interrupted")
+
+    monkeypatch.setattr(alembic_autogenerate_enums, "rebuild_index_concurrently", rebuild_once)
+    with pytest.raises(RuntimeError), caplog.at_level(logging.INFO, logger="alembic_autogenerate_enums"):
+        run_op(engine, concurrent_indexes=True, **REMOVE_BLUE)
+    assert any(definitions[1] in message and "dropping" in message for message in caplog.messages)
+    assert any(message.endswith(definitions[1]) and "failed" in message for message in caplog.messages)
+    with engine.begin() as conn:
+        assert conn.execute(text("SELECT step, object_name FROM alembic_enum_sync_journal")).fetchall() == [
+            ("index", "sync_target_trim_idx"),
+        ]
+
+    monkeypatch.setattr(alembic_autogenerate_enums, "rebuild_index_concurrently", rebuild)
+    run_op(engine, concurrent_indexes=True, **REMOVE_BLUE)
+    with engine.begin() as conn:
+        rows = conn.execute(text(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = 'sync_target' AND indexname <> 'sync_target_pkey' "
+            "ORDER BY indexname"
+        )).fetchall()
+        assert [row[0] for row in rows] == definitions
+        assert conn.execute(text("SELECT to_regclass('alembic_enum_sync_journal')")).scalar() is None
+
+
+def test_by_partition(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE sync_other (id int NOT NULL, color sync_color) PARTITION BY RANGE (id)"))
+        conn.execute(text("CREATE TABLE sync_other_1 PARTITION OF sync_other FOR VALUES FROM (0) TO (100)"))
+        conn.execute(text("CREATE TABLE sync_other_2 PARTITION OF sync_other FOR VALUES FROM (100) TO (200)"))
+        conn.execute(text("CREATE TABLE sync_other_rest PARTITION OF sync_other DEFAULT"))
+        conn.execute(text("CREATE INDEX sync_other_color_idx ON sync_other (color)"))
+        conn.execute(text("INSERT INTO sync_other SELECT i, 'green' FROM generate_series(1, 300) AS i"))
+        assert get_table_costs(conn, ["public.sync_other"])["public.sync_other"].table_bytes > 0
+
+    with instrument() as log:
+        run_op(engine, by_partition=True, partition_workers=2, **REMOVE_BLUE)
+
+    statements = [event.statement for event in log.events if event.kind == "alter_table"]
+    swap = statements.index("ALTER TABLE public.sync_other ALTER COLUMN color TYPE public.sync_color "
+                            "USING color::text::public.sync_color")
+    assert sorted(statements[:swap]) == [
+        f"ALTER TABLE public.sync_other DETACH PARTITION public.{partition}"
+        for partition in ("sync_other_1", "sync_other_2", "sync_other_rest")
+    ]
+    attaches = [statement for statement in statements if " ATTACH PARTITION " in statement]
+    assert len(attaches) == 3 and attaches[-1].endswith("public.sync_other_rest DEFAULT")
+    assert "ADD CONSTRAINT sync_other_1_sync_color_bound CHECK" in " ".join(statements)
+
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(["red", "green"])
+        assert conn.execute(text("SELECT count(*) FROM sync_other WHERE color = 'green'")).scalar() == 300
+        partitions = get_partitions(conn, ["public.sync_other", "public.sync_target"])
+        assert list(partitions) == ["public.sync_other"]
+        assert [partition.relname for partition in partitions["public.sync_other"]] == [
+            "sync_other_1", "sync_other_2", "sync_other_rest",
+        ]
+        assert conn.execute(text(
+            "SELECT count(*) FROM pg_inherits WHERE inhparent = 'sync_other_color_idx'::regclass"
+        )).scalar() == 3
+        assert conn.execute(text(
+            "SELECT count(*) FROM pg_constraint WHERE conname LIKE '%_bound'"
+        )).scalar() == 0
+        conn.execute(text("ALTER TABLE sync_other DETACH PARTITION sync_other_2"))
+
+    # Attached partitions are skipped, converted ones only attached back.
+    with instrument() as log:
+        with engine.begin() as conn:
+            convert_partitions(
+                conn, "public", "sync_color", "public.sync_other", ["color"], partitions["public.sync_other"]
+            )
+    assert [event.statement for event in log.events if event.kind == "alter_table"] == [
+        "ALTER TABLE public.sync_other_2 DROP CONSTRAINT IF EXISTS sync_other_2_sync_color_bound, "
+        "ADD CONSTRAINT sync_other_2_sync_color_bound CHECK (((id IS NOT NULL) AND (id >= 100) AND (id < 200)))",
+        "ALTER TABLE public.sync_other ATTACH PARTITION public.sync_other_2 FOR VALUES FROM (100) TO (200)",
+        "ALTER TABLE public.sync_other_2 DROP CONSTRAINT IF EXISTS sync_other_2_sync_color_bound",
+    ]
+
+
+def test_by_partition_resumes_after_a_failure(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE sync_other (id int NOT NULL, color sync_color) PARTITION BY LIST (id)"))
+        conn.execute(text("CREATE TABLE sync_other_1 PARTITION OF sync_other FOR VALUES IN (1)"))
+        conn.execute(text("CREATE TABLE sync_other_2 PARTITION OF sync_other FOR VALUES IN (2)"))
+        conn.execute(text("INSERT INTO sync_other VALUES (1, 'green'), (2, 'blue')"))
+
+    with pytest.raises(sqlalchemy.exc.DataError):
+        run_op(engine, by_partition=True, preflight=False, **REMOVE_BLUE)
+
+    with engine.begin() as conn:
+        entries = conn.execute(text("SELECT step, object_name FROM alembic_enum_sync_journal")).fetchall()
+        assert entries == [("partition", "public.sync_other_2")]
+    with pytest.raises(EnumValueInUseError) as info:
+        run_op(engine, by_partition=True, **REMOVE_BLUE)
+    assert info.value.table_name == "public.sync_other_2"
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE sync_other_2 SET color = 'green'"))
+    with instrument() as log:
+        run_op(engine, by_partition=True, **REMOVE_BLUE)
+    assert "rename_type" not in {event.kind for event in log.events}
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(["red", "green"])
+        assert conn.execute(text("SELECT count(*) FROM sync_other WHERE color = 'green'")).scalar() == 2
+        partitions = get_partitions(conn, ["public.sync_other"])["public.sync_other"]
+        assert [partition.relname for partition in partitions] == ["sync_other_1", "sync_other_2"]
+        assert conn.execute(text("SELECT to_regclass('alembic_enum_sync_journal')")).scalar() is None
+
+
+def test_sync_enum_values_delta(engine):
+    extra = [f"v{i:04d}" for i in range(2500)]
+    with engine.begin() as conn:
+        add_enum_values(conn, "public", "sync_color", extra)
+    old_values = ["red", "green", "blue"] + extra
+    new_values = ["red", "green", "teal"] + extra
+
+    [op] = delta_sync_enum_values_ops([SyncEnumValuesOp(
+        "public", "sync_color", old_values, new_values, [("sync_target", "main")], should_reverse=True,
+    )], min_values=1000)
+    assert render_sync_enum_values_delta_op(None, op) == (
+        "op.sync_enum_values_delta('public', 'sync_color', ['teal'], ['blue'], %r, %r, [('sync_target', 'main')], "
+        "True)" % (enum_values_hash(old_values), enum_values_hash(new_values))
+    )
+    assert op.reverse().old_values_hash == enum_values_hash(new_values)
+
+    def run(**kwargs):
+        with engine.begin() as conn:
+            Operations(MigrationContext.configure(conn)).sync_enum_values_delta(**kwargs)
+
+    args = dict(
+        schema=op.schema, name=op.name, added_values=op.added_values, removed_values=op.removed_values,
+        old_values_hash=op.old_values_hash, new_values_hash=op.new_values_hash,
+        affected_columns=op.affected_columns, should_reverse=True,
+    )
+    with instrument() as log:
+        run(**args)
+    created = [event.statement for event in log.events if event.kind in ("create_type", "add_value")]
+    assert created[0].startswith("CREATE TYPE public.sync_color_new AS ENUM('green', 'red', 'teal', 'v0000'")
+    assert created[0].count("'") == 2 * 1000
+    # The other values are added in one round trip on psycopg2.
+    assert len(created) == 2 and created[1].count(";") == 1503 - 1
+    assert created[1].endswith("; ALTER TYPE public.sync_color_new ADD VALUE IF NOT EXISTS 'v2499'")
+    assert [event.statement for event in log.events if event.kind == "rename_type"] == [
+        "ALTER TYPE public.sync_color RENAME TO sync_color_old",
+        "ALTER TYPE public.sync_color_new RENAME TO sync_color",
+    ]
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(new_values)
+        rows = conn.execute(text("SELECT main::text, trim::text FROM sync_target ORDER BY id")).fetchall()
+        assert [tuple(row) for row in rows] == [("red", "green"), ("green", None)]
+
+    with instrument() as log:
+        run(**args)
+    assert {event.kind for event in log.events} == {"catalog"}
+
+    with pytest.raises(EnumValuesMismatchError) as error:
+        run(**dict(args, old_values_hash="0" * 64, new_values_hash="1" * 64))
+    assert error.value.values == frozenset(new_values)
+
+
+def test_deferred_enum_sync(engine):
+    columns = [("sync_target", "main"), ("sync_target", "trim")]
+    with instrument() as log:
+        with engine.begin() as conn:
+            op = Operations(MigrationContext.configure(conn))
+            with deferred_enum_sync() as deferred:
+                op.sync_enum_values("public", "sync_color", ["red", "green", "blue"], ["red", "green", "blue", "cyan"],
+                                    columns)
+                op.sync_enum_values("public", "sync_color", ["red", "green", "blue", "cyan"],
+                                    ["red", "green", "blue", "cyan", "teal"], columns)
+                op.sync_enum_values("public", "sync_color", ["red", "green", "blue", "cyan", "teal"],
+                                    ["red", "green", "teal"], columns, True)
+                op.sync_enum_values("public", "sync_color", ["red", "green", "teal"], ["red", "green", "teal", "lime"],
+                                    columns)
+                assert [event for event in log.events if event.kind != "catalog"] == []
+    assert (deferred.queued, deferred.applied) == (4, 1)
+    assert [event.kind for event in log.events if event.kind not in ("catalog", "preflight")] == [
+        "rename_type", "create_type", "alter_table", "drop_type",
+    ]
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(
+            ["red", "green", "teal", "lime"]
+        )
+
+    # A rename applies the queue of its enum first; additions alone are sent
+    # within the migration's transaction.
+    with instrument() as log:
+        with engine.begin() as conn:
+            op = Operations(MigrationContext.configure(conn))
+            with deferred_enum_sync():
+                op.sync_enum_values("public", "sync_color", ["red", "green"], ["red", "green", "cyan"], columns)
+                op.rename_enum_value("public", "sync_color", "green", "olive")
+    assert [event.statement for event in log.events if event.kind in ("add_value", "rename_value", "transaction")] == [
+        "ALTER TYPE public.sync_color ADD VALUE IF NOT EXISTS 'cyan'",
+        "ALTER TYPE public.sync_color RENAME VALUE 'green' TO 'olive'",
+    ]
+
+    with pytest.raises(RuntimeError):
+        with engine.begin() as conn:
+            with deferred_enum_sync():
+                Operations(MigrationContext.configure(conn)).sync_enum_values(
+                    "public", "sync_color", ["red"], ["red", "pink"], columns,
+                )
+                raise RuntimeError
+    with engine.begin() as conn:
+        assert "pink" not in get_defined_enums(conn, "public").enum_definitions["sync_color"]
+
+
+def test_resumable(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE sync_other (id serial PRIMARY KEY, color sync_color)"))
+        conn.execute(text("INSERT INTO sync_other (color) VALUES ('red')"))
+        conn.execute(text("UPDATE sync_target SET trim = 'blue' WHERE trim IS NULL"))
+
+    with pytest.raises(sqlalchemy.exc.DataError):
+        run_op(engine, resumable=True, preflight=False, **REMOVE_BLUE)
+
+    def column_types():
+        return dict(conn.execute(text(
+            "SELECT attrelid::regclass || '.' || attname, atttypid::regtype::text FROM pg_attribute "
+            "WHERE attrelid IN ('sync_other'::regclass, 'sync_target'::regclass) AND attname IN ('color', 'trim')"
+        )).fetchall())
+
+    with engine.begin() as conn:
+        assert column_types() == {"sync_other.color": "sync_color", "sync_target.trim": "sync_color_old"}
+        assert conn.execute(text("SELECT step, object_name FROM alembic_enum_sync_journal")).fetchall() == [
+            ("converted", "public.sync_other"),
+        ]
+        conn.execute(text("UPDATE sync_target SET trim = NULL WHERE trim = 'blue'"))
+
+    with pytest.raises(SyncEnumValuesError):
+        run_op(engine, resumable=True, **dict(REMOVE_BLUE, new_values=["red"]))
+
+    with instrument() as log:
+        run_op(engine, resumable=True, **REMOVE_BLUE)
+    assert [event.table_name for event in log.events if event.kind == "alter_table"] == ["public.sync_target"]
+    assert "rename_type" not in {event.kind for event in log.events}
+    assert [event.statement.split(" (")[0] for event in log.events if event.kind == "journal_table"] == [
+        "CREATE TABLE IF NOT EXISTS public.alembic_enum_sync_journal", "DROP TABLE public.alembic_enum_sync_journal",
+    ]
+    with engine.begin() as conn:
+        assert column_types() == {"sync_other.color": "sync_color", "sync_target.trim": "sync_color"}
+        enums = get_defined_enums(conn, "public").enum_definitions
+        assert enums["sync_color"] == frozenset(["red", "green"]) and "sync_color_old" not in enums
+        assert conn.execute(text("SELECT to_regclass('alembic_enum_sync_journal')")).scalar() is None
+
+    with pytest.raises(ValueError):
+        run_op(engine, resumable=True, strategy="online", **REMOVE_BLUE)
+
+
+def test_prebuilt_type_with_lock_options(engine):
+    extra = [f"v{i:04d}" for i in range(1500)]
+    with engine.begin() as conn:
+        add_enum_values(conn, "public", "sync_color", extra)
+
+    with instrument() as log:
+        run_op(engine, lock_timeout="2s", lock_retries=1, **dict(
+            REMOVE_BLUE, old_values=REMOVE_BLUE["old_values"] + extra, new_values=REMOVE_BLUE["new_values"] + extra,
+        ))
+    assert "ALTER TYPE public.sync_color_new RENAME TO sync_color" in [event.statement for event in log.events]
+    with engine.begin() as conn:
+        assert get_defined_enums(conn, "public").enum_definitions["sync_color"] == frozenset(
+            ["red", "green"] + extra
+        )